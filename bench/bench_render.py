@@ -0,0 +1,111 @@
+"""
+消息渲染微基准：测量 Markdown 转义、签到结果渲染与批量汇总的耗时，
+并和旧实现（19 次 str.replace 转义 + 逐分支拼接）对比，用于发现渲染路径上的性能回退。
+
+用法：
+    python bench/bench_render.py                   # 1000 条结果
+    python bench/bench_render.py --results 5000 --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("TG_BOT_TOKEN", "123456:bench")
+os.environ.setdefault("TG_ADMIN_ID", "1")
+
+import main  # noqa: E402
+from main import SigninOutcome, SigninResult  # noqa: E402
+
+# 每 20 条结果中：14 条签到收益、3 条重复签到、2 条 Cookie 失效、1 条网络异常
+OUTCOME_MIX = [SigninOutcome.SUCCESS] * 14 + [SigninOutcome.DUPLICATE] * 3 + [SigninOutcome.COOKIE_INVALID] * 2 + [SigninOutcome.NETWORK_ERROR]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="NodeSeek Bot 消息渲染微基准")
+    parser.add_argument("--results", type=int, default=1000, help="每轮渲染的签到结果数")
+    parser.add_argument("--repeat", type=int, default=10, help="重复轮数，取最快一轮")
+    return parser.parse_args()
+
+
+def make_results(count):
+    results = []
+    for i in range(count):
+        outcome = OUTCOME_MIX[i % len(OUTCOME_MIX)]
+        results.append(SigninResult(
+            account=f"user_{i}.bench",
+            outcome=outcome,
+            reward=5 if outcome is SigninOutcome.SUCCESS else None,
+            http_status=200,
+            message="ConnectError: [Errno 111] *refused*" if outcome is SigninOutcome.NETWORK_ERROR else "",
+        ))
+    return results
+
+
+def legacy_escape_markdown(text):
+    escape_chars = r'\_*[]()~`>#+-=|{}.!'
+    for ch in escape_chars:
+        text = text.replace(ch, f'\\{ch}')
+    return text
+
+
+def legacy_render(result):
+    """
+    旧实现的主要开销：每次渲染都重新转义账号名并包两层反引号，再按分支拼接
+    """
+    name = f"`{'`' + legacy_escape_markdown(result.account) + '`'}`"
+    outcome = result.outcome
+    if outcome is SigninOutcome.SUCCESS:
+        return f"✅ 账号 {name} 签到成功，收益 {result.reward if result.reward is not None else '未知'} 个🍗"
+    if outcome is SigninOutcome.DUPLICATE:
+        return f"⚠️ 账号 {name} 今天已签到（重复签到）。"
+    if outcome is SigninOutcome.COOKIE_INVALID:
+        return f"❌ 账号 {name} Cookie已失效或不正确。"
+    if outcome is SigninOutcome.NETWORK_ERROR:
+        return f"❌ 账号 {name} 签到请求网络异常: {result.message}"
+    return f"❌ 账号 {name} 签到发生未知错误: {result.message}"
+
+
+def best_of(repeat, func):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main_bench():
+    args = parse_args()
+    results = make_results(args.results)
+    names = [result.account for result in results]
+
+    # 正确性：账号名只包一层反引号，含反引号的名字退回为转义文本
+    assert main.wrap_md_code("a_b") == "`a_b`"
+    assert main.wrap_md_code("a`b") == "a\\`b"
+    assert "``" not in main.render_batch_summary(results)
+
+    def render_cold():
+        main.wrap_md_code.cache_clear()
+        for result in results:
+            main.render_signin_result(result)
+
+    cases = [
+        ("转义（旧：19 次 replace）", lambda: [legacy_escape_markdown(name) for name in names]),
+        ("转义（正则单次扫描）", lambda: [main.escape_markdown(name) for name in names]),
+        ("渲染（旧实现）", lambda: [legacy_render(result) for result in results]),
+        ("渲染（名称缓存未命中）", render_cold),
+        ("渲染（名称缓存命中）", lambda: [main.render_signin_result(result) for result in results]),
+        ("批量汇总", lambda: main.render_batch_summary(results)),
+    ]
+    print(f"{args.results} 条结果，取 {args.repeat} 轮中最快一轮：")
+    for label, func in cases:
+        elapsed = best_of(args.repeat, func)
+        print(f"  {label:<24} {elapsed * 1000:8.2f} ms  {elapsed / args.results * 1e6:6.2f} µs/条")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,176 @@
+"""
+基准测试用的本地替身服务器（在独立子进程中运行，不影响被测进程的线程数与内存统计）：
+
+* 假的 NodeSeek /api/attendance：按 Cookie 中的 session=<模式>-<序号> 返回不同结果
+  - reward:       200，签到收益
+  - duplicate:    200，请勿重复签到
+  - unauthorized: 401，Unauthorized
+  - slow:         先等待 slow_ms 毫秒，再返回签到收益
+* 假的 Telegram Bot API：/bot<token>/<method>，支持 getMe / sendMessage / editMessageText，
+  可选每 N 条 sendMessage 返回一次 429（retry_after=1）；
+  额外的 benchSent 方法返回并清空已发送消息的记录（时间戳、chat_id、文本），供端到端测试计算响应延迟。
+"""
+import json
+import multiprocessing
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+ATTENDANCE_MODES = ("reward", "duplicate", "unauthorized", "slow")
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持长连接，和真实服务一样复用连接
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_attendance_handler(latency_ms, slow_ms):
+    class AttendanceHandler(_JsonHandler):
+        def do_POST(self):
+            self._read_body()
+            if not self.path.startswith("/api/attendance"):
+                self._reply(404, {"message": "Not Found"})
+                return
+            cookie = self.headers.get("Cookie", "")
+            session = cookie.split("session=", 1)[1].split(";", 1)[0] if "session=" in cookie else ""
+            mode = session.split("-", 1)[0]
+            time.sleep((slow_ms if mode == "slow" else latency_ms) / 1000)
+            if mode == "unauthorized" or not session:
+                self._reply(401, {"success": False, "message": "Unauthorized"})
+            elif mode == "duplicate":
+                self._reply(200, {"success": False, "message": "今天已完成签到，请勿重复操作"})
+            else:
+                self._reply(200, {"success": True, "message": "签到收益 5 个鸡腿", "gain": 5})
+
+    return AttendanceHandler
+
+
+def make_telegram_handler(latency_ms, flood_every):
+    counter = {"send": 0, "message_id": 0}
+    sent = []  # (time.time(), chat_id, text)
+    lock = threading.Lock()
+
+    class TelegramHandler(_JsonHandler):
+        def _params(self):
+            body = self._read_body()
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                return json.loads(body or b"{}")
+            return {k: v[0] for k, v in parse_qs(body.decode()).items()}
+
+        def do_POST(self):
+            params = self._params()
+            method = self.path.rsplit("/", 1)[-1]
+            time.sleep(latency_ms / 1000)
+            if method == "getMe":
+                self._reply(200, {"ok": True, "result": {
+                    "id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot",
+                    "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False,
+                }})
+                return
+            if method == "benchSent":
+                with lock:
+                    records = sent[:]
+                    sent.clear()
+                self._reply(200, {"ok": True, "result": records})
+                return
+            if method in ("sendMessage", "editMessageText"):
+                with lock:
+                    if method == "sendMessage":
+                        counter["send"] += 1
+                        flooded = flood_every and counter["send"] % flood_every == 0
+                    else:
+                        flooded = False
+                    counter["message_id"] += 1
+                    message_id = int(params.get("message_id") or counter["message_id"])
+                if flooded:
+                    self._reply(429, {"ok": False, "error_code": 429,
+                                      "description": "Too Many Requests: retry after 1",
+                                      "parameters": {"retry_after": 1}})
+                    return
+                chat_id = int(params.get("chat_id") or 1)
+                if method == "sendMessage":
+                    with lock:
+                        sent.append((time.time(), chat_id, params.get("text", "")))
+                self._reply(200, {"ok": True, "result": {
+                    "message_id": message_id, "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", ""),
+                }})
+                return
+            self._reply(200, {"ok": True, "result": True})
+
+        do_GET = do_POST
+
+    return TelegramHandler
+
+
+def _serve(conn, latency_ms, slow_ms, tg_latency_ms, tg_flood_every):
+    servers = [
+        ThreadingHTTPServer(("127.0.0.1", 0), make_attendance_handler(latency_ms, slow_ms)),
+        ThreadingHTTPServer(("127.0.0.1", 0), make_telegram_handler(tg_latency_ms, tg_flood_every)),
+    ]
+    for server in servers:
+        server.daemon_threads = True
+        server.request_queue_size = 1024
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    conn.send([server.server_port for server in servers])
+    conn.recv()  # 等待父进程通知退出
+    for server in servers:
+        server.shutdown()
+
+
+class FakeServers:
+    """
+    在子进程中启动两个替身服务，nodeseek_url / telegram_url 可直接用作
+    NODESEEK_BASE_URL / TG_API_BASE_URL
+    """
+    def __init__(self, latency_ms=50, slow_ms=2000, tg_latency_ms=20, tg_flood_every=0):
+        self._args = (latency_ms, slow_ms, tg_latency_ms, tg_flood_every)
+        self._process = None
+        self._conn = None
+        self.nodeseek_url = None
+        self.telegram_url = None
+
+    def start(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.get_context("spawn").Process(
+            target=_serve, args=(child_conn, *self._args), daemon=True
+        )
+        self._process.start()
+        nodeseek_port, telegram_port = parent_conn.recv()
+        self._conn = parent_conn
+        self.nodeseek_url = f"http://127.0.0.1:{nodeseek_port}"
+        self.telegram_url = f"http://127.0.0.1:{telegram_port}/bot"
+        return self
+
+    def stop(self):
+        if self._process is None:
+            return
+        try:
+            self._conn.send("stop")
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,279 @@
+"""
+离线性能基准：在本地替身服务（bench/fake_servers.py）上运行真实的签到、/check 与群发代码路径，
+统计墙钟时间、单请求延迟 p50/p99、峰值 RSS 与线程数，用于在上线前发现性能回退。
+
+用法：
+    python bench/run_bench.py                                   # 10/100/1000 个账号，全部场景
+    python bench/run_bench.py --sizes 100 --scenarios signin --backend cloudscraper
+    python bench/run_bench.py --rps 2 --tg-rate 25              # 按生产环境的限速运行
+    python bench/run_bench.py --scenarios signin --workers 4    # 多进程签到 worker
+
+默认关闭签到随机延迟与全部限速，测的是 Bot 自身的开销；账号按固定比例混合
+签到收益 / 重复签到 / Cookie 失效 / 慢响应 四种结果。
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_servers import FakeServers  # noqa: E402
+
+SCENARIOS = ("signin", "check", "broadcast")
+# 每 20 个账号中：14 个正常签到、3 个重复签到、2 个 Cookie 失效、1 个慢响应
+ACCOUNT_MIX = ["reward"] * 14 + ["duplicate"] * 3 + ["unauthorized"] * 2 + ["slow"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="NodeSeek Bot 离线性能基准")
+    parser.add_argument("--sizes", default="10,100,1000", help="账号/订阅者数量，逗号分隔")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"要运行的场景：{','.join(SCENARIOS)}")
+    parser.add_argument("--backend", default="httpx", help="ATTENDANCE_BACKEND：httpx / cloudscraper / auto")
+    parser.add_argument("--concurrency", type=int, default=5, help="SIGNIN_CONCURRENCY")
+    parser.add_argument("--workers", type=int, default=0, help="SIGNIN_WORKERS，签到 worker 进程数，0 为进程内签到")
+    parser.add_argument("--check-concurrency", type=int, default=10, help="CHECK_CONCURRENCY")
+    parser.add_argument("--rps", type=float, default=0, help="SIGNIN_MAX_RPS，0 为不限速")
+    parser.add_argument("--tg-rate", type=float, default=0, help="TG_BROADCAST_RATE，0 为不限速")
+    parser.add_argument("--latency-ms", type=int, default=50, help="替身签到接口的响应延迟")
+    parser.add_argument("--slow-ms", type=int, default=2000, help="慢响应账号的响应延迟")
+    parser.add_argument("--tg-latency-ms", type=int, default=20, help="替身 Bot API 的响应延迟")
+    parser.add_argument("--tg-flood-every", type=int, default=0, help="每 N 条 sendMessage 返回一次 429，0 为关闭")
+    parser.add_argument("--json", dest="json_path", help="把结果另存为 JSON 文件")
+    return parser.parse_args()
+
+
+def configure_env(args, servers):
+    os.environ.update({
+        "TG_BOT_TOKEN": "123456:bench",
+        "TG_ADMIN_ID": "1",
+        "NODESEEK_BASE_URL": servers.nodeseek_url,
+        "TG_API_BASE_URL": servers.telegram_url,
+        "ATTENDANCE_BACKEND": args.backend,
+        "SIGNIN_CONCURRENCY": str(args.concurrency),
+        "SIGNIN_WORKERS": str(args.workers),
+        "CHECK_CONCURRENCY": str(args.check_concurrency),
+        "SIGNIN_MAX_RPS": str(args.rps),
+        "TG_BROADCAST_RATE": str(args.tg_rate),
+        "SIGNIN_JITTER_MIN": "0",
+        "SIGNIN_JITTER_MAX": "0",
+        "STORAGE_BACKEND": "json",
+    })
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples = []
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class TimedTransport:
+    """
+    包装 main.attendance_transport，记录每次签到请求的耗时
+    """
+    def __init__(self, inner, recorder):
+        self.inner = inner
+        self.recorder = recorder
+        self.name = inner.name
+
+    async def post(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self.inner.post(*args, **kwargs)
+        finally:
+            self.recorder.samples.append(time.perf_counter() - started)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class TimedWorkers:
+    """
+    包装 main.sign_in_workers，按 worker 返回的耗时记录每次签到请求
+    """
+    def __init__(self, inner, recorder):
+        self.inner = inner
+        self.recorder = recorder
+
+    async def request(self, *args, **kwargs):
+        result = await self.inner.request(*args, **kwargs)
+        self.recorder.samples.append(result.latency)
+        return result
+
+
+class TimedBot:
+    """
+    包装 Bot，记录 sendMessage / editMessageText 的耗时
+    """
+    def __init__(self, bot, recorder):
+        self._bot = bot
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._bot, name)
+
+    async def _timed(self, method, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(**kwargs)
+        finally:
+            self._recorder.samples.append(time.perf_counter() - started)
+
+    async def send_message(self, **kwargs):
+        return await self._timed(self._bot.send_message, **kwargs)
+
+    async def edit_message_text(self, **kwargs):
+        return await self._timed(self._bot.edit_message_text, **kwargs)
+
+
+class ThreadSampler:
+    """
+    周期性采样线程数，记录场景运行期间的最大值
+    """
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self.peak = max(self.peak, threading.active_count())
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+        self.peak = max(self.peak, threading.active_count())
+
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def synthetic_accounts(n):
+    return [
+        {"name": f"bench_{i:05d}", "cookie": f"session={ACCOUNT_MIX[i % len(ACCOUNT_MIX)]}-{i}"}
+        for i in range(n)
+    ]
+
+
+def reset_state(main, n_accounts, n_subscribers):
+    items = synthetic_accounts(n_accounts)
+    for acc in items:
+        # 上一个场景留下的当天结果 / 失效 Cookie 记录会让请求被跳过
+        main.cookie_health.clear(acc["name"])
+        main.daily_outcomes.discard(acc["name"])
+    main.accounts = main.AccountStore(main.storage, items)
+    main.atomic_write_json(main.SUBSCRIBERS_FILE, list(range(1, n_subscribers + 1)))
+    main.subscribers = main.SubscriberRegistry(main.storage)
+
+
+async def scenario_signin(main, bot, n, recorder):
+    reset_state(main, n, 1)
+    await main.sign_in_all_accounts_async()
+
+
+async def scenario_check(main, bot, n, recorder):
+    reset_state(main, n, 1)
+    update = SimpleNamespace(effective_chat=SimpleNamespace(id=1))
+    context = SimpleNamespace(bot=TimedBot(bot, LatencyRecorder()))
+    await main.check_all_accounts(update, context, probe=True)
+
+
+async def scenario_broadcast(main, bot, n, recorder):
+    reset_state(main, 0, n)
+    await main.broadcast_to_subscribers(TimedBot(bot, recorder), "📢 bench")
+
+
+async def run_all(main, args):
+    sizes = [int(x) for x in args.sizes.split(",") if x]
+    scenarios = [x for x in args.scenarios.split(",") if x]
+    runners = {"signin": scenario_signin, "check": scenario_check, "broadcast": scenario_broadcast}
+    bot = await main.get_notify_bot()
+    raw_transport = main.attendance_transport
+    raw_workers = main.start_signin_workers()
+    results = []
+    try:
+        for scenario in scenarios:
+            for n in sizes:
+                recorder = LatencyRecorder()
+                if scenario != "broadcast":
+                    main.attendance_transport = TimedTransport(raw_transport, recorder)
+                    if raw_workers is not None:
+                        main.sign_in_workers = TimedWorkers(raw_workers, recorder)
+                with ThreadSampler() as sampler, contextlib.redirect_stdout(io.StringIO()):
+                    started = time.perf_counter()
+                    await runners[scenario](main, bot, n, recorder)
+                    wall = time.perf_counter() - started
+                main.attendance_transport = raw_transport
+                main.sign_in_workers = raw_workers
+                row = {
+                    "scenario": scenario,
+                    "size": n,
+                    "wall_s": round(wall, 3),
+                    "requests": len(recorder.samples),
+                    "p50_ms": round(recorder.percentile(0.50) * 1000, 1),
+                    "p99_ms": round(recorder.percentile(0.99) * 1000, 1),
+                    "peak_rss_mb": round(peak_rss_mb(), 1),
+                    "peak_threads": sampler.peak,
+                }
+                results.append(row)
+                print_row(row)
+    finally:
+        if raw_workers is not None:
+            await raw_workers.close()
+        await raw_transport.aclose()
+        await bot.shutdown()
+    return results
+
+
+HEADER = f"{'scenario':<10} {'size':>6} {'wall(s)':>9} {'requests':>9} {'p50(ms)':>9} {'p99(ms)':>9} {'rss(MB)':>8} {'threads':>8}"
+
+
+def print_row(row):
+    print(f"{row['scenario']:<10} {row['size']:>6} {row['wall_s']:>9.3f} {row['requests']:>9} "
+          f"{row['p50_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['peak_rss_mb']:>8.1f} {row['peak_threads']:>8}")
+
+
+def main_entry():
+    args = parse_args()
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    with FakeServers(args.latency_ms, args.slow_ms, args.tg_latency_ms, args.tg_flood_every) as servers:
+        configure_env(args, servers)
+        workdir = tempfile.mkdtemp(prefix="nodeseek-bench-")
+        os.chdir(workdir)  # 被测代码的 data/ 目录落在临时目录中
+        logging.disable(logging.WARNING)
+        import main  # noqa: E402  环境变量需在导入前设置
+
+        print(f"backend={args.backend} concurrency={args.concurrency} workers={args.workers} "
+              f"rps={args.rps or '∞'} workdir={workdir}")
+        print(HEADER)
+        results = asyncio.run(run_all(main, args))
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main_entry()
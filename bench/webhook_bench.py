@@ -0,0 +1,225 @@
+"""
+webhook 模式端到端测试：在本地替身服务（bench/fake_servers.py）上以 BOT_MODE=webhook 启动真实的 main.py，
+按固定速率向 webhook 推送 /check、/check --probe、/retry 更新，统计从推送到 Bot 回复（替身 Bot API
+收到 sendMessage）的延迟；最后发送 /add 后立即 SIGTERM，确认退出前后台签到结果仍被发出。
+
+用法：
+    python bench/webhook_bench.py                                  # 200 条更新，CONCURRENT_UPDATES=8
+    python bench/webhook_bench.py --updates 500 --rate 100 --concurrent-updates 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+import pytz
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_servers import FakeServers  # noqa: E402
+
+TOKEN = "123456:bench"
+SECRET = "bench-secret"
+COMMANDS = ("check", "probe", "retry")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="NodeSeek Bot webhook 模式端到端测试")
+    parser.add_argument("--accounts", type=int, default=50, help="合成账号数")
+    parser.add_argument("--updates", type=int, default=200, help="推送的更新数，按 /check、/check --probe、/retry 轮流")
+    parser.add_argument("--rate", type=float, default=50, help="每秒推送的更新数")
+    parser.add_argument("--connections", type=int, default=40, help="推送使用的连接数（Telegram 默认 40）")
+    parser.add_argument("--concurrent-updates", type=int, default=8, help="CONCURRENT_UPDATES")
+    parser.add_argument("--latency-ms", type=int, default=50, help="替身签到接口的响应延迟")
+    parser.add_argument("--tg-latency-ms", type=int, default=20, help="替身 Bot API 的响应延迟")
+    parser.add_argument("--drain-timeout", type=float, default=30, help="SHUTDOWN_DRAIN_TIMEOUT")
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare_workdir(n_accounts):
+    """
+    写入合成账号，并把它们标记为今天已完成，避免定时签到在测试期间触发
+    """
+    workdir = tempfile.mkdtemp(prefix="nodeseek-webhook-")
+    os.makedirs(os.path.join(workdir, "data"))
+    names = [f"bench_{i:05d}" for i in range(n_accounts)]
+    today = datetime.now(pytz.timezone("Asia/Shanghai")).date().isoformat()
+    with open(os.path.join(workdir, "data", "accounts.json"), "w", encoding="utf-8") as f:
+        json.dump([{"name": name, "cookie": f"session=duplicate-{i}"} for i, name in enumerate(names)], f)
+    with open(os.path.join(workdir, "data", "schedule.json"), "w", encoding="utf-8") as f:
+        json.dump({"accounts": {name: today for name in names}}, f)
+    return workdir, names
+
+
+def make_update(update_id, chat_id, text):
+    command = text.split()[0]
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        },
+    }
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] if ordered else 0.0
+
+
+class SentLog:
+    """
+    轮询替身 Bot API 的 benchSent，记录每个聊天收到的消息
+    """
+    def __init__(self, client, telegram_url):
+        self.client = client
+        self.url = f"{telegram_url}{TOKEN}/benchSent"
+        self.by_chat = {}
+
+    async def poll(self):
+        response = await self.client.post(self.url)
+        for sent_at, chat_id, text in response.json()["result"]:
+            self.by_chat.setdefault(chat_id, []).append((sent_at, text))
+
+    async def wait_for(self, chat_ids, count=1, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await self.poll()
+            if all(len(self.by_chat.get(chat_id, ())) >= count for chat_id in chat_ids):
+                return True
+            await asyncio.sleep(0.1)
+        return False
+
+
+async def wait_until_listening(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"main.py 提前退出，返回码 {process.returncode}")
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("等待 webhook 服务启动超时")
+
+
+async def run(args, servers, workdir, names, port, process):
+    webhook_url = f"http://127.0.0.1:{port}/telegram"
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await wait_until_listening(port, process)
+        sent_log = SentLog(client, servers.telegram_url)
+
+        # 校验：路径错误返回 404，secret token 错误返回 403
+        assert (await client.post(f"http://127.0.0.1:{port}/other", json={})).status_code == 404
+        forged = await client.post(webhook_url, json={}, headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+        assert forged.status_code == 403
+        headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+        posted = {}  # chat_id -> (命令, 推送时间)
+
+        async def push(i):
+            kind = COMMANDS[i % len(COMMANDS)]
+            name = names[i % len(names)]
+            text = {"check": f"/check {name}", "probe": f"/check {name} --probe", "retry": f"/retry {name}"}[kind]
+            chat_id = 1000 + i
+            posted[chat_id] = (kind, time.time())
+            response = await client.post(webhook_url, json=make_update(i + 1, chat_id, text), headers=headers)
+            assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        pushes = []
+        for i in range(args.updates):
+            pushes.append(asyncio.create_task(push(i)))
+            await asyncio.sleep(1 / args.rate)
+        await asyncio.gather(*pushes)
+        complete = await sent_log.wait_for(posted)
+        wall = time.perf_counter() - started
+
+        print(f"{args.updates} 条更新，{args.rate:g}/s，CONCURRENT_UPDATES={args.concurrent_updates}，总耗时 {wall:.2f}s"
+              + ("" if complete else "（部分更新超时未回复）"))
+        print(f"{'command':<8} {'count':>6} {'p50(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9}")
+        for kind in COMMANDS:
+            latencies = [
+                sent_log.by_chat[chat_id][0][0] - posted_at
+                for chat_id, (k, posted_at) in posted.items() if k == kind and chat_id in sent_log.by_chat
+            ]
+            print(f"{kind:<8} {len(latencies):>6} {percentile(latencies, 0.5) * 1000:>9.1f} "
+                  f"{percentile(latencies, 0.99) * 1000:>9.1f} {max(latencies, default=0) * 1000:>9.1f}")
+
+        # 优雅退出：/add 慢响应账号后立即 SIGTERM，签到结果应在进程退出前发出
+        chat_id = 999
+        await client.post(webhook_url, json=make_update(args.updates + 1, chat_id, "/add drain_check session=slow-1"),
+                          headers=headers)
+        await sent_log.wait_for([chat_id])
+        process.send_signal(signal.SIGTERM)
+        stop_started = time.perf_counter()
+        returncode = await asyncio.to_thread(process.wait, args.drain_timeout + 30)
+        await sent_log.poll()
+        replies = [text for _, text in sent_log.by_chat.get(chat_id, [])]
+        drained = len(replies) >= 2
+        print(f"SIGTERM 后 {time.perf_counter() - stop_started:.2f}s 退出，返回码 {returncode}，"
+              f"后台签到结果{'已发出' if drained else '丢失'}")
+        return complete and drained and returncode == 0
+
+
+def main_entry():
+    args = parse_args()
+    with FakeServers(args.latency_ms, 2000, args.tg_latency_ms, 0) as servers:
+        workdir, names = prepare_workdir(args.accounts)
+        port = free_port()
+        env = dict(
+            os.environ,
+            TG_BOT_TOKEN=TOKEN,
+            TG_ADMIN_ID="1",
+            BOT_MODE="webhook",
+            WEBHOOK_URL=f"http://127.0.0.1:{port}/telegram",
+            WEBHOOK_LISTEN="127.0.0.1",
+            WEBHOOK_PORT=str(port),
+            WEBHOOK_SECRET=SECRET,
+            CONCURRENT_UPDATES=str(args.concurrent_updates),
+            SHUTDOWN_DRAIN_TIMEOUT=str(args.drain_timeout),
+            NODESEEK_BASE_URL=servers.nodeseek_url,
+            TG_API_BASE_URL=servers.telegram_url,
+            ATTENDANCE_BACKEND="httpx",
+            SIGNIN_JITTER_MIN="0",
+            SIGNIN_JITTER_MAX="0",
+            SIGNIN_MAX_RPS="0",
+            STORAGE_BACKEND="json",
+        )
+        log_path = os.path.join(workdir, "bot.log")
+        print(f"workdir={workdir}（Bot 输出见 bot.log）")
+        with open(log_path, "w", encoding="utf-8") as log:
+            process = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py")], cwd=workdir, env=env,
+                                       stdout=log, stderr=subprocess.STDOUT)
+            try:
+                ok = asyncio.run(run(args, servers, workdir, names, port, process))
+            finally:
+                if process.poll() is None:
+                    process.kill()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main_entry()
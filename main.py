@@ -3,24 +3,91 @@ import json
 import requests
 import random
 import time
+import zlib
 import cloudscraper
 import pytz
 import asyncio
+import hashlib
+import heapq
+import hmac
+import secrets
+import signal
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
-from telegram import Update, BotCommand
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters
+from enum import Enum
+from telegram import Bot, Update, BotCommand, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, ChatMigrated, Forbidden, InvalidToken, NetworkError, RetryAfter, TelegramError, TimedOut
+from telegram.request import HTTPXRequest
+from telegram.ext import ApplicationBuilder, CallbackQueryHandler, CommandHandler, ContextTypes, MessageHandler, filters
 import re # 用于正则表达式匹配签到收益
 import traceback  # 新增，打印完整异常堆栈
 from dateutil.parser import parse
 import logging
+import multiprocessing
+import sqlite3
+import httpx
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from urllib.parse import urlsplit
 
 # === 配置区域 ===
 ACCOUNTS_FILE = "data/accounts.json"  # 存储账号信息的文件路径
 SUBSCRIBERS_FILE = "data/subscribers.json"
-SIGNIN_LOG_FILE = "data/last_signin.json"
+SUBSCRIBER_STATE_FILE = "data/subscriber_state.json"  # 订阅者投递状态（停用的聊天等）
+COOKIE_HEALTH_FILE = "data/cookie_health.json"  # 已确认失效的 Cookie 记录
+DAILY_OUTCOMES_FILE = "data/daily_outcomes.json"  # 各账号当天的签到结果，供 /check 直接读取
+SCHEDULE_FILE = "data/schedule.json"  # 定时签到状态：当天已完成签到的账号（JSON 存储）
+SIGNIN_LOG_FILE = "data/last_signin.json"  # 旧版签到日志，启动时迁移到 SIGNIN_JOURNAL_DIR
+SIGNIN_JOURNAL_DIR = "data/signin_journal"  # 按天分段的签到日志目录
+SIGNIN_LOG_RETENTION_DAYS = 7  # 签到日志保留天数
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")  # 数据存储：json（默认）/ sqlite
+SQLITE_FILE = "data/nodeseek.db"  # STORAGE_BACKEND=sqlite 时使用的数据库文件
+ACCOUNT_HISTORY_RETENTION_DAYS = 365  # SQLite 中单账号签到历史的保留天数
 CHINA_TZ = pytz.timezone("Asia/Shanghai")  # 使用上海时区
 DEFAULT_MODE = (os.getenv("DEFAULT", "false").lower() == "true")  # 签到模式
 ADMIN_USER_ID = int(os.getenv("TG_ADMIN_ID", "0"))  # 管理员TG ID
+SIGNIN_CONCURRENCY = max(1, int(os.getenv("SIGNIN_CONCURRENCY", "5")))  # 批量签到并发 worker 数
+SIGNIN_MAX_RPS = float(os.getenv("SIGNIN_MAX_RPS", "2"))  # 对 nodeseek.com 的全局每秒请求上限，<=0 表示不限制
+SIGNIN_JITTER_MIN = float(os.getenv("SIGNIN_JITTER_MIN", "3"))  # 每个账号签到前的随机延迟下限（秒）
+SIGNIN_JITTER_MAX = float(os.getenv("SIGNIN_JITTER_MAX", "6"))  # 每个账号签到前的随机延迟上限（秒）
+SIGNIN_WORKERS = max(0, int(os.getenv("SIGNIN_WORKERS", "0")))  # 签到 worker 进程数，0 表示在 Bot 进程内签到
+SIGNIN_MAX_ATTEMPTS = max(1, int(os.getenv("SIGNIN_MAX_ATTEMPTS", "3")))  # 单账号签到最多尝试次数（含首次）
+SIGNIN_RETRY_BASE_DELAY = float(os.getenv("SIGNIN_RETRY_BASE_DELAY", "2"))  # 重试退避的基准延迟（秒），每次翻倍
+SIGNIN_RETRY_MAX_DELAY = float(os.getenv("SIGNIN_RETRY_MAX_DELAY", "60"))  # 重试退避的延迟上限（秒）
+SIGNIN_RETRY_BUDGET = max(0, int(os.getenv("SIGNIN_RETRY_BUDGET", "20")))  # 重试预算：定时签到（含 /retry、/add 的签到）每天共用一份，/force 每次单独一份
+CIRCUIT_FAILURE_THRESHOLD = max(1, int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")))  # 连续多少次上游故障后熔断
+CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "120"))  # 熔断后暂停请求的时间（秒），之后用单个账号探测
+CIRCUIT_MAX_WAIT = float(os.getenv("CIRCUIT_MAX_WAIT", "1800"))  # 批量签到（定时签到按窗口计算）因熔断最多等待的总时间（秒），超过后跳过剩余账号
+SIGNIN_WINDOWS = os.getenv("SIGNIN_WINDOWS", "07:00-09:00")  # 每日签到时间窗口，多个用逗号分隔，未指定窗口的账号按名称哈希分到其中一个
+COOKIE_DEAD_TTL = float(os.getenv("COOKIE_DEAD_TTL", str(7 * 86400)))  # 失效 Cookie 记录的有效期（秒），过期后重新尝试一次
+SCRAPER_POOL_MAX = max(1, int(os.getenv("SCRAPER_POOL_MAX", "64")))  # 会话池最多保留的空闲会话数
+SCRAPER_IDLE_TTL = float(os.getenv("SCRAPER_IDLE_TTL", "1800"))  # 空闲会话超过该秒数后被回收
+NODESEEK_BASE_URL = os.getenv("NODESEEK_BASE_URL", "https://www.nodeseek.com").rstrip("/")  # 仅在测试/基准时指向本地替身
+TG_API_BASE_URL = os.getenv("TG_API_BASE_URL", "https://api.telegram.org/bot")  # Bot API 地址（同上）
+ATTENDANCE_BACKEND = os.getenv("ATTENDANCE_BACKEND", "auto")  # 签到请求后端：auto / httpx / cloudscraper
+CHECK_CONCURRENCY = max(1, int(os.getenv("CHECK_CONCURRENCY", "10")))  # /check 查询全部账号时的并发数
+CHECK_TIMEOUT = float(os.getenv("CHECK_TIMEOUT", "40"))  # /check 单个账号的查询截止时间（秒）
+TG_BROADCAST_RATE = float(os.getenv("TG_BROADCAST_RATE", "25"))  # 群发时全局每秒消息数上限（Telegram 约 30 条/秒）
+TG_PER_CHAT_RATE = 1.0  # 同一聊天每秒最多 1 条
+TG_BROADCAST_CONCURRENCY = max(1, int(os.getenv("TG_BROADCAST_CONCURRENCY", "20")))  # 群发并发数
+TG_SEND_MAX_ATTEMPTS = 3  # 单条消息最多尝试次数
+MESSAGE_CHUNK_LIMIT = 4000  # 单条消息的最大长度（Telegram 上限 4096，留出余量）
+LIST_PAGE_SIZE = 30  # /list 每页显示的账号数
+MD_NAME_CACHE_SIZE = 4096  # 缓存的账号名 Markdown 片段数
+BLOCKING_IO_WORKERS = max(1, int(os.getenv("BLOCKING_IO_WORKERS", "16")))  # cloudscraper 等阻塞请求的线程数
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")  # 指标端点监听地址
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 指标端点端口，0 表示不启用
+TG_CONNECTION_POOL_SIZE = int(os.getenv("TG_CONNECTION_POOL_SIZE", str(TG_BROADCAST_CONCURRENCY + 8)))  # Bot API 连接池大小
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()  # 接收更新的方式：polling（默认）/ webhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # webhook 模式下 Telegram 推送更新的公网地址，如 https://bot.example.com/telegram
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")  # webhook 服务监听地址（通常在反向代理之后）
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))  # webhook 服务监听端口
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # 校验请求头 X-Telegram-Bot-Api-Secret-Token，留空则每次启动随机生成
+CONCURRENT_UPDATES = max(1, int(os.getenv("CONCURRENT_UPDATES", "1")))  # 同时处理的更新数，1 为逐条顺序处理
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "30"))  # 退出时等待后台任务完成的最长时间（秒）
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
@@ -30,6 +97,11 @@ last_signin_time = None  # 最近签到时间缓存
 pending_push = set()  # 记录等待输入推送内容的用户 ID 集合
 is_signing_in = False  # 全局变量
 tasks: list[asyncio.Task] = []  # 保存任务引用
+notify_bot = None  # 推送通知使用的长期 Bot 实例
+owns_notify_bot = False  # notify_bot 是否由本模块创建（需要自行关闭）
+metrics_server = None  # 指标端点（METRICS_PORT > 0 时启用）
+sign_in_workers = None  # 签到 worker 进程池（SIGNIN_WORKERS > 0 时启用）
+IS_WORKER_PROCESS = multiprocessing.parent_process() is not None  # 当前是否为签到 worker 子进程（只发请求，不打开存储、不加载账号等状态）
 
 # === 工具函数 ===
 def get_now():
@@ -38,45 +110,736 @@ def get_now():
     """
     return datetime.now(CHINA_TZ)
 
-def wrap_md_code(text):
-    return f"`{escape_markdown(text)}`"
+def atomic_write_json(path, data, indent=2):
+    """
+    先写临时文件再原子替换，避免写到一半时崩溃导致文件损坏
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, path)
+
+# === 数据存储 ===
+
+class JsonStorage:
+    """
+    默认的 JSON 文件存储：账号、订阅者各一个文件，签到日志为按天分段的 JSON Lines
+    """
+    name = "json"
+
+    def load_accounts(self):
+        if os.path.exists(ACCOUNTS_FILE):
+            with open(ACCOUNTS_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return []
+
+    def save_accounts(self, items, changed, deleted):
+        # JSON 文件只能整体重写，忽略增量信息
+        atomic_write_json(ACCOUNTS_FILE, items)
+
+    def load_subscribers(self):
+        if os.path.exists(SUBSCRIBERS_FILE):
+            with open(SUBSCRIBERS_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return []
+
+    def add_subscriber(self, chat_id, subscribers):
+        atomic_write_json(SUBSCRIBERS_FILE, list(subscribers))
+
+    def load_subscriber_state(self):
+        if os.path.exists(SUBSCRIBER_STATE_FILE):
+            with open(SUBSCRIBER_STATE_FILE, "r", encoding="utf-8") as f:
+                return {int(chat_id): state for chat_id, state in json.load(f).items()}
+        return {}
+
+    def save_subscriber_state(self, states, changed):
+        atomic_write_json(SUBSCRIBER_STATE_FILE, {str(chat_id): state for chat_id, state in states.items()})
+
+    def load_cookie_health(self):
+        if os.path.exists(COOKIE_HEALTH_FILE):
+            with open(COOKIE_HEALTH_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def save_cookie_health(self, states, changed):
+        atomic_write_json(COOKIE_HEALTH_FILE, states)
+
+    def load_daily_outcomes(self):
+        if os.path.exists(DAILY_OUTCOMES_FILE):
+            with open(DAILY_OUTCOMES_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def save_daily_outcomes(self, states, changed):
+        atomic_write_json(DAILY_OUTCOMES_FILE, states)
+
+    def load_signin_completed(self):
+        if os.path.exists(SCHEDULE_FILE):
+            with open(SCHEDULE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f).get("accounts", {})
+        return {}
+
+    def save_signin_completed(self, states, changed):
+        atomic_write_json(SCHEDULE_FILE, {"accounts": states})
+
+    def make_journal(self):
+        return SigninJournal(SIGNIN_JOURNAL_DIR, SIGNIN_LOG_RETENTION_DAYS)
+
+    def record_account_result(self, account_name, status, message):
+        pass  # JSON 存储不保存单账号历史
+
+    def account_stats(self, account_name, days):
+        return None
+
+    def close(self):
+        pass
+
+class SqliteStorage:
+    """
+    可选的 SQLite 存储（STORAGE_BACKEND=sqlite）：WAL 模式，带索引的表，
+    写入在事务中完成，首次启动时一次性导入现有 JSON 数据；
+    额外保存每个账号的历次签到结果，用于查询成功率趋势。
+    """
+    name = "sqlite"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    CREATE TABLE IF NOT EXISTS accounts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        cookie TEXT NOT NULL,
+        window TEXT
+    );
+    CREATE TABLE IF NOT EXISTS subscribers (chat_id INTEGER PRIMARY KEY);
+    CREATE TABLE IF NOT EXISTS subscriber_state (
+        chat_id INTEGER PRIMARY KEY,
+        active INTEGER NOT NULL DEFAULT 1,
+        failures INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        updated_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_subscriber_state_active ON subscriber_state(active);
+    CREATE TABLE IF NOT EXISTS daily_outcome (
+        account TEXT PRIMARY KEY,
+        day TEXT NOT NULL,
+        outcome TEXT NOT NULL,
+        reward INTEGER,
+        time TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS signin_completed (
+        account TEXT PRIMARY KEY,
+        day TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS cookie_health (
+        account TEXT PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        failed_at TEXT NOT NULL,
+        reason TEXT
+    );
+    CREATE TABLE IF NOT EXISTS signin_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        day TEXT NOT NULL,
+        time TEXT NOT NULL,
+        status TEXT NOT NULL,
+        message TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_signin_log_day ON signin_log(day);
+    CREATE TABLE IF NOT EXISTS account_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        account TEXT NOT NULL,
+        day TEXT NOT NULL,
+        time TEXT NOT NULL,
+        status TEXT NOT NULL,
+        message TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_account_history_account_day ON account_history(account, day);
+    CREATE INDEX IF NOT EXISTS idx_account_history_day ON account_history(day);
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(self.SCHEMA)
+        self._migrate_schema()
+        self._migrate_from_json()
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            with self.conn:
+                yield self.conn
+
+    def _migrate_schema(self):
+        """
+        为旧版本创建的数据库补齐新增的列
+        """
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(accounts)")}
+        if "window" not in columns:
+            with self.transaction() as conn:
+                conn.execute("ALTER TABLE accounts ADD COLUMN window TEXT")
+
+    def _migrate_from_json(self):
+        """
+        首次启用 SQLite 时导入现有的 JSON 数据（原文件保持不变，方便回退）
+        """
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+        json_storage = JsonStorage()
+        items = json_storage.load_accounts()
+        subs = json_storage.load_subscribers()
+        sub_state = json_storage.load_subscriber_state()
+        cookie_health = json_storage.load_cookie_health()
+        completed = json_storage.load_signin_completed()
+        outcomes = json_storage.load_daily_outcomes()
+        logs = list(_iter_json_signin_logs())
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO accounts (name, cookie, window) VALUES (?, ?, ?)",
+                [(acc["name"], acc["cookie"], acc.get("window")) for acc in items],
+            )
+            conn.executemany("INSERT OR IGNORE INTO subscribers (chat_id) VALUES (?)", [(uid,) for uid in subs])
+            conn.executemany(
+                "INSERT OR IGNORE INTO subscriber_state (chat_id, active, failures, last_error, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(chat_id, int(st["active"]), st["failures"], st["last_error"], st["updated_at"]) for chat_id, st in sub_state.items()],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO cookie_health (account, fingerprint, failed_at, reason) VALUES (?, ?, ?, ?)",
+                [(name, st["fingerprint"], st["failed_at"], st["reason"]) for name, st in cookie_health.items()],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO signin_completed (account, day) VALUES (?, ?)", list(completed.items())
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO daily_outcome (account, day, outcome, reward, time) VALUES (?, ?, ?, ?, ?)",
+                [(name, st["day"], st["outcome"], st["reward"], st["time"]) for name, st in outcomes.items()],
+            )
+            conn.executemany(
+                "INSERT INTO signin_log (day, time, status, message) VALUES (?, ?, ?, ?)",
+                [(e["time"][:10], e["time"], e["status"], e["message"]) for e in logs],
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (get_now().isoformat(),))
+        print(f"📦 已从 JSON 导入 {len(items)} 个账号、{len(subs)} 个订阅者、{len(logs)} 条签到日志到 {self.path}")
+
+    def load_accounts(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT name, cookie, window FROM accounts ORDER BY id").fetchall()
+        items = []
+        for name, cookie, window in rows:
+            acc = {"name": name, "cookie": cookie}
+            if window:
+                acc["window"] = window  # 与 JSON 一致：未指定窗口时不带该字段
+            items.append(acc)
+        return items
+
+    def save_accounts(self, items, changed, deleted):
+        by_name = {acc["name"]: acc for acc in items}
+        upserts = [(name, by_name[name]["cookie"], by_name[name].get("window")) for name in changed if name in by_name]
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM accounts WHERE name = ?", [(name,) for name in deleted if name not in by_name])
+            conn.executemany(
+                "INSERT INTO accounts (name, cookie, window) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET cookie = excluded.cookie, window = excluded.window",
+                upserts,
+            )
+
+    def load_subscribers(self):
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT chat_id FROM subscribers ORDER BY rowid")]
+
+    def add_subscriber(self, chat_id, subscribers):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO subscribers (chat_id) VALUES (?)", (chat_id,))
+
+    def load_subscriber_state(self):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT chat_id, active, failures, last_error, updated_at FROM subscriber_state"
+            ).fetchall()
+        return {
+            chat_id: {"active": bool(active), "failures": failures, "last_error": last_error, "updated_at": updated_at}
+            for chat_id, active, failures, last_error, updated_at in rows
+        }
+
+    def save_subscriber_state(self, states, changed):
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO subscriber_state (chat_id, active, failures, last_error, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET active = excluded.active, failures = excluded.failures, "
+                "last_error = excluded.last_error, updated_at = excluded.updated_at",
+                [
+                    (chat_id, int(states[chat_id]["active"]), states[chat_id]["failures"],
+                     states[chat_id]["last_error"], states[chat_id]["updated_at"])
+                    for chat_id in changed
+                ],
+            )
+
+    def load_cookie_health(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT account, fingerprint, failed_at, reason FROM cookie_health").fetchall()
+        return {
+            account: {"fingerprint": fingerprint, "failed_at": failed_at, "reason": reason}
+            for account, fingerprint, failed_at, reason in rows
+        }
+
+    def save_cookie_health(self, states, changed):
+        """
+        changed 中不在 states 里的账号视为已删除
+        """
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM cookie_health WHERE account = ?", [(name,) for name in changed if name not in states])
+            conn.executemany(
+                "INSERT INTO cookie_health (account, fingerprint, failed_at, reason) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(account) DO UPDATE SET fingerprint = excluded.fingerprint, "
+                "failed_at = excluded.failed_at, reason = excluded.reason",
+                [
+                    (name, states[name]["fingerprint"], states[name]["failed_at"], states[name]["reason"])
+                    for name in changed if name in states
+                ],
+            )
+
+    def load_daily_outcomes(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT account, day, outcome, reward, time FROM daily_outcome").fetchall()
+        return {
+            account: {"day": day, "outcome": outcome, "reward": reward, "time": time_str}
+            for account, day, outcome, reward, time_str in rows
+        }
+
+    def save_daily_outcomes(self, states, changed):
+        """
+        changed 中不在 states 里的账号视为已删除
+        """
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM daily_outcome WHERE account = ?", [(name,) for name in changed if name not in states])
+            conn.executemany(
+                "INSERT INTO daily_outcome (account, day, outcome, reward, time) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(account) DO UPDATE SET day = excluded.day, outcome = excluded.outcome, "
+                "reward = excluded.reward, time = excluded.time",
+                [
+                    (name, states[name]["day"], states[name]["outcome"], states[name]["reward"], states[name]["time"])
+                    for name in changed if name in states
+                ],
+            )
+
+    def load_signin_completed(self):
+        with self._lock:
+            return dict(self.conn.execute("SELECT account, day FROM signin_completed").fetchall())
+
+    def save_signin_completed(self, states, changed):
+        """
+        changed 中不在 states 里的账号视为已删除
+        """
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM signin_completed WHERE account = ?", [(name,) for name in changed if name not in states])
+            conn.executemany(
+                "INSERT INTO signin_completed (account, day) VALUES (?, ?) ON CONFLICT(account) DO UPDATE SET day = excluded.day",
+                [(name, states[name]) for name in changed if name in states],
+            )
+
+    def make_journal(self):
+        return SqliteSigninJournal(self, SIGNIN_LOG_RETENTION_DAYS)
+
+    def record_account_result(self, account_name, status, message):
+        now_str = get_now().strftime("%Y-%m-%d %H:%M:%S %z")
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO account_history (account, day, time, status, message) VALUES (?, ?, ?, ?, ?)",
+                (account_name, now_str[:10], now_str, status, message.strip()),
+            )
+
+    def account_stats(self, account_name, days):
+        """
+        返回最近 days 天每天的 (日期, 成功次数, 总次数)
+        """
+        since = (get_now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        with self._lock:
+            return self.conn.execute(
+                "SELECT day, SUM(status IN ('success', 'already')), COUNT(*) FROM account_history "
+                "WHERE account = ? AND day >= ? GROUP BY day ORDER BY day",
+                (account_name, since),
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def prune_history(self, retention_days):
+        cutoff = (get_now() - timedelta(days=retention_days)).strftime("%Y-%m-%d")
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM account_history WHERE day < ?", (cutoff,))
+
+def _iter_json_signin_logs():
+    """
+    依次读出旧版 last_signin.json 与按天分段日志中的所有记录（用于迁移）
+    """
+    if os.path.exists(SIGNIN_LOG_FILE):
+        with open(SIGNIN_LOG_FILE, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+    if os.path.isdir(SIGNIN_JOURNAL_DIR):
+        for name in sorted(os.listdir(SIGNIN_JOURNAL_DIR)):
+            if not name.endswith(".jsonl"):
+                continue
+            with open(os.path.join(SIGNIN_JOURNAL_DIR, name), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+def build_storage(backend: str):
+    backend = backend.lower()
+    if backend == "sqlite":
+        return SqliteStorage(SQLITE_FILE)
+    if backend != "json":
+        logger.warning(f"未知的 STORAGE_BACKEND={backend}，使用 json")
+    return JsonStorage()
+
+storage = None if IS_WORKER_PROCESS else build_storage(STORAGE_BACKEND)
+
+class AccountStore(list):
+    """
+    账号仓库：本身就是 list[dict]，原有的列表用法（遍历、下标、append、remove、json.dumps 等）全部可用，
+    额外维护按账号名称的索引，查找为 O(1)；
+    保存在有事件循环时延迟 save_delay 秒合并执行，短时间内的多次修改只写一次文件。
+    保存时把每个账号与上次落盘的内容逐项比较，直接修改账号字典（如 acc["cookie"] = ...）也会被写入。
+    """
+    def __init__(self, storage, items, save_delay: float = 1.0):
+        super().__init__(items)
+        self.storage = storage
+        self.save_delay = save_delay
+        self._index = {acc["name"]: acc for acc in self}
+        self._persisted = {name: dict(acc) for name, acc in self._index.items()}  # 上次落盘时的内容
+        self._save_handle = None
+        self._dirty = False
+
+    def _reindex(self):
+        self._index = {acc["name"]: acc for acc in self}
+
+    def __contains__(self, item):
+        if isinstance(item, str):
+            return item in self._index
+        return super().__contains__(item)
+
+    def __setitem__(self, i, value):
+        super().__setitem__(i, value)
+        self._reindex()
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self._reindex()
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def append(self, acc: dict):
+        super().append(acc)
+        self._index[acc["name"]] = acc
+
+    def extend(self, items):
+        for acc in items:
+            self.append(acc)
+
+    def insert(self, i, acc: dict):
+        super().insert(i, acc)
+        self._index[acc["name"]] = acc
+
+    def remove(self, acc: dict):
+        super().remove(acc)
+        self._index.pop(acc["name"], None)
+
+    def pop(self, i=-1):
+        acc = super().pop(i)
+        self._index.pop(acc["name"], None)
+        return acc
+
+    def clear(self):
+        super().clear()
+        self._index.clear()
+
+    def get(self, name: str):
+        return self._index.get(name)
+
+    def upsert(self, name: str, cookie: str):
+        """
+        添加或更新账号，返回 (账号, 是否新建)
+        """
+        acc = self._index.get(name)
+        if acc is not None:
+            acc["cookie"] = cookie
+            return acc, False
+        acc = {"name": name, "cookie": cookie}
+        self.append(acc)
+        return acc, True
+
+    def delete(self, name: str):
+        acc = self._index.get(name)
+        if acc is None:
+            return False
+        self.remove(acc)
+        return True
+
+    def save(self):
+        """
+        标记需要保存：在事件循环中延迟合并写入，否则立即写入
+        """
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(self.save_delay, self.flush)
+
+    def flush(self):
+        """
+        立即写入尚未落盘的修改：与上次落盘的内容比较，得出新增/修改和删除的账号
+        """
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._reindex()  # 账号名也可能被直接修改
+        changed = {name for name, acc in self._index.items() if self._persisted.get(name) != acc}
+        deleted = self._persisted.keys() - self._index.keys()
+        self._persisted = {name: dict(acc) for name, acc in self._index.items()}
+        self.storage.save_accounts(list(self), changed, deleted)
 
 def load_accounts():
     """
-    从文件加载账号列表，返回列表格式
+    从存储加载账号列表，返回 AccountStore（用法与列表一致）
     """
-    if os.path.exists(ACCOUNTS_FILE):
-        with open(ACCOUNTS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+    return AccountStore(storage, storage.load_accounts())
 
 def save_accounts(accounts):
     """
-    保存账号列表到文件
+    保存账号列表（合并短时间内的多次保存；JSON 存储原子替换写入，SQLite 只写变更的行）
     """
-    os.makedirs(os.path.dirname(ACCOUNTS_FILE), exist_ok=True)
-    with open(ACCOUNTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(accounts, f, ensure_ascii=False, indent=2)
+    accounts.save()
 
-accounts = load_accounts()
+accounts = None if IS_WORKER_PROCESS else load_accounts()
 
-def load_subscribers():
-    if os.path.exists(SUBSCRIBERS_FILE):
-        with open(SUBSCRIBERS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+class SubscriberRegistry:
+    """
+    内存中的订阅者集合（保持订阅顺序），启动时加载一次，通过 add_subscriber 保持最新，
+    推送时直接使用，不再每次从文件重新读取。
+    同时记录每个订阅者的投递状态：屏蔽了 Bot 或已注销的聊天会被自动停用，
+    之后的群发不再发送给它们，直到对方重新 /start。
+    """
+    def __init__(self, storage):
+        self.storage = storage
+        self._ids = dict.fromkeys(storage.load_subscribers())  # 有序集合
+        self._state = storage.load_subscriber_state()  # chat_id -> 投递状态，只保存出过问题的订阅者
+
+    def __iter__(self):
+        return iter(list(self._ids))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, chat_id):
+        return chat_id in self._ids
+
+    def is_active(self, chat_id):
+        state = self._state.get(chat_id)
+        return state is None or state["active"]
+
+    def active_ids(self):
+        return [chat_id for chat_id in self._ids if self.is_active(chat_id)]
+
+    def counts(self):
+        """
+        返回 (总数, 活跃数)
+        """
+        inactive = sum(1 for chat_id in self._ids if not self.is_active(chat_id))
+        return len(self._ids), len(self._ids) - inactive
+
+    def add(self, chat_id: int):
+        if chat_id in self._ids:
+            if not self.is_active(chat_id):
+                # 重新 /start 的用户恢复推送
+                self._update_state([chat_id], active=True, failures=0, last_error=None)
+            return False
+        self._ids[chat_id] = None
+        self.storage.add_subscriber(chat_id, self._ids)
+        return True
+
+    def _update_state(self, chat_ids, **fields):
+        now_str = get_now().strftime("%Y-%m-%d %H:%M:%S %z")
+        for chat_id in chat_ids:
+            state = self._state.setdefault(chat_id, {"active": True, "failures": 0, "last_error": None})
+            state.update(fields, updated_at=now_str)
+        if chat_ids:
+            self.storage.save_subscriber_state(self._state, chat_ids)
+
+    def record_delivery(self, report):
+        """
+        根据群发结果更新投递状态；只有状态发生变化的订阅者才会写入存储
+        """
+        now_str = get_now().strftime("%Y-%m-%d %H:%M:%S %z")
+        changed = []
+        for chat_id in report.delivered:
+            state = self._state.get(chat_id)
+            if state and (state["failures"] or not state["active"]):
+                state.update(active=True, failures=0, last_error=None, updated_at=now_str)
+                changed.append(chat_id)
+        for chat_id, error in report.errors.items():
+            state = self._state.setdefault(chat_id, {"active": True, "failures": 0, "last_error": None})
+            state.update(failures=state["failures"] + 1, last_error=error, updated_at=now_str)
+            if chat_id in report.dead:
+                state["active"] = False
+                print(f"🔕 订阅者 {chat_id} 已屏蔽 Bot 或不存在，停止向其推送: {error}")
+            changed.append(chat_id)
+        if changed:
+            self.storage.save_subscriber_state(self._state, changed)
+
+subscribers = None if IS_WORKER_PROCESS else SubscriberRegistry(storage)
 
-def save_subscribers(subscribers):
-    os.makedirs(os.path.dirname(SUBSCRIBERS_FILE), exist_ok=True)
-    with open(SUBSCRIBERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(subscribers, f, ensure_ascii=False, indent=2)
+def add_subscriber(user_id: int):
+    subscribers.add(user_id)
 
-subscribers = load_subscribers()
+def cookie_fingerprint(cookie_dict):
+    """
+    Cookie 内容的摘要，用于判断失效记录是否仍对应当前 Cookie
+    """
+    raw = "; ".join(f"{k}={v}" for k, v in sorted(cookie_dict.items()))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
 
-def add_subscriber(user_id: int):
-    if user_id not in subscribers:
-        subscribers.append(user_id)
-        save_subscribers(subscribers)
+class CookieHealth:
+    """
+    Cookie 健康缓存：记录返回过 Unauthorized/401 的账号及其 Cookie 摘要。
+    记录有效期内（COOKIE_DEAD_TTL），批量签到和 /check 直接跳过这些账号，不再请求 nodeseek.com；
+    /add 更新 Cookie（摘要变化）或再次签到成功后记录自动失效。
+    """
+    def __init__(self, storage, ttl: float):
+        self.storage = storage
+        self.ttl = ttl
+        self._state = storage.load_cookie_health()  # 账号名 -> {"fingerprint", "failed_at", "reason"}
+
+    def dead_entry(self, account_name, cookie_dict):
+        """
+        返回当前 Cookie 仍处于有效期内的失效记录，没有则返回 None
+        """
+        entry = self._state.get(account_name)
+        if not entry or entry["fingerprint"] != cookie_fingerprint(cookie_dict):
+            return None
+        failed_at = datetime.strptime(entry["failed_at"], "%Y-%m-%d %H:%M:%S %z")
+        if (get_now() - failed_at).total_seconds() >= self.ttl:
+            return None
+        return entry
+
+    def cached_result(self, account_name, cookie_dict):
+        """
+        对已知失效的账号直接给出 COOKIE_INVALID 结果（不发请求），否则返回 None
+        """
+        entry = self.dead_entry(account_name, cookie_dict)
+        if entry is None:
+            return None
+        return SigninResult(account_name, SigninOutcome.COOKIE_INVALID, message=f"{entry['failed_at'][:16]} 起", cached=True)
+
+    def record(self, result, cookie_dict):
+        """
+        根据请求结果更新记录：Cookie 失效时写入，签到/检查成功时清除
+        """
+        name = result.account
+        if result.outcome is SigninOutcome.COOKIE_INVALID:
+            fingerprint = cookie_fingerprint(cookie_dict)
+            if self.dead_entry(name, cookie_dict) is None:
+                self._state[name] = {
+                    "fingerprint": fingerprint,
+                    "failed_at": get_now().strftime("%Y-%m-%d %H:%M:%S %z"),
+                    "reason": result.message,
+                }
+                self.storage.save_cookie_health(self._state, [name])
+        elif result.ok and name in self._state:
+            self.clear(name)
+
+    def clear(self, account_name):
+        if self._state.pop(account_name, None) is not None:
+            self.storage.save_cookie_health(self._state, [account_name])
+
+cookie_health = None if IS_WORKER_PROCESS else CookieHealth(storage, COOKIE_DEAD_TTL)
+
+class DailyOutcomes:
+    """
+    各账号当天（上海时区）的签到结果：签到或状态检查得到“成功/已签到”后记录，
+    /check 对今天已签到的账号直接读取这里，不再请求 api/attendance（该接口本身会执行签到）。
+    写入在事件循环中延迟 save_delay 秒合并执行，批量签到时不会每个账号写一次文件。
+    """
+    def __init__(self, storage, save_delay: float = 1.0):
+        self.storage = storage
+        self.save_delay = save_delay
+        today = get_now().strftime("%Y-%m-%d")
+        # 只保留今天的记录，过期记录在下次保存时一并删除
+        self._state = storage.load_daily_outcomes()
+        self._changed = {name for name, entry in self._state.items() if entry["day"] != today}
+        for name in self._changed:
+            del self._state[name]
+        self._save_handle = None
+
+    def get(self, account_name):
+        """
+        返回账号今天的签到结果（SigninResult，cached=True），没有则返回 None
+        """
+        entry = self._state.get(account_name)
+        if entry is None or entry["day"] != get_now().strftime("%Y-%m-%d"):
+            return None
+        return SigninResult(
+            account_name, SigninOutcome(entry["outcome"]), reward=entry["reward"],
+            message=f"今日 {entry['time'][:5]} 记录", cached=True,
+        )
+
+    def record(self, result):
+        if result.cached or not result.ok:
+            return
+        now = get_now()
+        self._state[result.account] = {
+            "day": now.strftime("%Y-%m-%d"),
+            "outcome": result.outcome.value,
+            "reward": result.reward,
+            "time": now.strftime("%H:%M:%S"),
+        }
+        self._changed.add(result.account)
+        self.save()
+
+    def discard(self, account_name):
+        if self._state.pop(account_name, None) is not None:
+            self._changed.add(account_name)
+            self.save()
+
+    def save(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(self.save_delay, self.flush)
+
+    def flush(self):
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if self._changed:
+            changed, self._changed = self._changed, set()
+            self.storage.save_daily_outcomes(self._state, changed)
+
+daily_outcomes = None if IS_WORKER_PROCESS else DailyOutcomes(storage)
+
+def local_check_result(account_name, cookie_dict):
+    """
+    只根据本地记录回答 /check：已知失效的 Cookie 或今天已签到的账号直接返回结果，否则返回 None
+    """
+    return cookie_health.cached_result(account_name, cookie_dict) or daily_outcomes.get(account_name)
 
 def parse_cookie(cookie_str):
     """
@@ -97,57 +860,261 @@ def create_scraper():
         browser={'browser': 'chrome', 'platform': 'windows', 'desktop': True}
     )
 
-def update_last_signin(result: str):
+class ScraperPool:
+    """
+    按账号复用 cloudscraper 会话，保留 TCP/TLS 连接和已通过的 Cloudflare cookie。
+    会话在使用期间从池中取出（同一会话不会被两个线程同时使用），用完归还；
+    空闲超过 idle_ttl 或超出 max_size 的会话会被关闭回收。
+    """
+    def __init__(self, max_size: int, idle_ttl: float):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._idle = OrderedDict()  # key -> (scraper, 最近归还时间)，按归还时间排序
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _pop_expired(self, now):
+        expired = []
+        while self._idle:
+            key, (scraper, last_used) = next(iter(self._idle.items()))
+            if now - last_used < self.idle_ttl:
+                break
+            del self._idle[key]
+            expired.append(scraper)
+        return expired
+
+    def acquire(self, key):
+        with self._lock:
+            stale = self._pop_expired(time.monotonic())
+            entry = self._idle.pop(key, None)
+            if entry:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.evictions += len(stale)
+        self._close_all(stale)
+        return entry[0] if entry else create_scraper()
+
+    def release(self, key, scraper):
+        with self._lock:
+            stale = self._pop_expired(time.monotonic())
+            replaced = self._idle.pop(key, None)
+            if replaced:
+                stale.append(replaced[0])
+            self._idle[key] = (scraper, time.monotonic())
+            while len(self._idle) > self.max_size:
+                stale.append(self._idle.popitem(last=False)[1][0])
+            self.evictions += len(stale)
+        self._close_all(stale)
+
+    def invalidate(self, key):
+        """
+        丢弃某个账号的空闲会话（例如 cookie 被更新后）
+        """
+        with self._lock:
+            entry = self._idle.pop(key, None)
+        if entry:
+            self._close_all([entry[0]])
+
+    @contextmanager
+    def session(self, key):
+        scraper = self.acquire(key)
+        try:
+            yield scraper
+        except Exception:
+            # 请求异常（超时、连接中断等）后连接状态不可信，不再放回池中
+            self._close_all([scraper])
+            raise
+        self.release(key, scraper)
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "idle": idle}
+
+    @staticmethod
+    def _close_all(scrapers):
+        for scraper in scrapers:
+            try:
+                scraper.close()
+            except Exception:
+                logger.debug(traceback.format_exc())
+
+scraper_pool = ScraperPool(SCRAPER_POOL_MAX, SCRAPER_IDLE_TTL)
+
+def update_last_signin(result: str, success: bool):
     """
-    更新最近签到记录
+    更新最近签到记录，状态由调用方给出，不再从文本中猜测
     """
     global last_signin_result, last_signin_time
     last_signin_result = result
     last_signin_time = get_now()
-    # 判断状态写入日志
-    record_signin("success" if "成功" in result else "fail", result)
+    record_signin("success" if success else "fail", result)
 
-def load_signin_logs():
-    try:
-        with open(SIGNIN_LOG_FILE, "r", encoding="utf-8") as f:
-            logs = json.load(f)
-    except FileNotFoundError:
-        logs = []
-    return logs
-
-def save_signin_logs(logs):
-    # 保留最近 7 天内的数据
-    threshold = get_now() - timedelta(days=7)
-    logs = [
-        entry for entry in logs
-        if parse(entry["time"]) >= threshold
-    ]
-    os.makedirs(os.path.dirname(SIGNIN_LOG_FILE), exist_ok=True)
-    with open(SIGNIN_LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(logs, f, ensure_ascii=False, indent=2)
+class SigninJournal:
+    """
+    签到日志：按上海时区日期分段的 JSON Lines 文件（data/signin_journal/YYYY-MM-DD.jsonl）。
+    每条记录只追加一行，不再整文件读改写；保留期按整段删除过期文件，无需逐条解析时间；
+    最近的若干条记录保存在内存中，供 /last 直接读取。
+    """
+    def __init__(self, directory: str, retention_days: int, tail_size: int = 50):
+        self.directory = directory
+        self.retention_days = retention_days
+        self._tail = deque(maxlen=tail_size)
+        self._current_day = None
+
+    def _segment_path(self, day: str):
+        return os.path.join(self.directory, f"{day}.jsonl")
+
+    def _segment_days(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(".jsonl")] for name in os.listdir(self.directory) if name.endswith(".jsonl"))
+
+    def load(self):
+        """
+        启动时调用：迁移旧日志文件、清理过期分段并恢复内存中的最近记录
+        """
+        self._migrate_legacy(SIGNIN_LOG_FILE)
+        self.compact()
+        entries = []
+        for day in reversed(self._segment_days()):
+            entries[:0] = self._read_segment(day)
+            if len(entries) >= self._tail.maxlen:
+                break
+        self._tail.extend(entries)
+
+    def _read_segment(self, day: str):
+        entries = []
+        corrupted = False
+        with open(self._segment_path(day), "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    corrupted = True  # 例如进程在写入一行时被中断
+        if corrupted:
+            self._rewrite_segment(day, entries)
+        return entries
+
+    def _rewrite_segment(self, day: str, entries):
+        path = self._segment_path(day)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+
+    def _migrate_legacy(self, legacy_file: str):
+        """
+        把旧版整文件 JSON 日志一次性拆分为按天分段的 JSON Lines
+        """
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, "r", encoding="utf-8") as f:
+                logs = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"旧签到日志无法读取，跳过迁移: {e}")
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        by_day = {}
+        for entry in logs:
+            by_day.setdefault(parse(entry["time"]).astimezone(CHINA_TZ).strftime("%Y-%m-%d"), []).append(entry)
+        for day, entries in by_day.items():
+            with open(self._segment_path(day), "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(legacy_file, f"{legacy_file}.migrated")
+        print(f"📦 已迁移 {len(logs)} 条旧签到日志到 {self.directory}")
+
+    def compact(self):
+        """
+        删除超出保留期的分段文件
+        """
+        cutoff = (get_now() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        for day in self._segment_days():
+            if day < cutoff:
+                os.remove(self._segment_path(day))
+
+    def append(self, entry: dict):
+        day = entry["time"][:10]
+        if day != self._current_day:
+            # 跨天时顺带清理过期分段
+            self._current_day = day
+            os.makedirs(self.directory, exist_ok=True)
+            self.compact()
+        with open(self._segment_path(day), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._tail.append(entry)
+
+    def latest(self):
+        return self._tail[-1] if self._tail else None
+
+class SqliteSigninJournal:
+    """
+    SQLite 存储下的签到日志，接口与 SigninJournal 一致
+    """
+    def __init__(self, storage, retention_days: int, tail_size: int = 50):
+        self.storage = storage
+        self.retention_days = retention_days
+        self._tail = deque(maxlen=tail_size)
+        self._current_day = None
+
+    def load(self):
+        self.compact()
+        with self.storage._lock:
+            rows = self.storage.conn.execute(
+                "SELECT time, status, message FROM signin_log ORDER BY id DESC LIMIT ?", (self._tail.maxlen,)
+            ).fetchall()
+        self._tail.extend({"time": t, "status": st, "message": m} for t, st, m in reversed(rows))
+
+    def compact(self):
+        cutoff = (get_now() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        with self.storage.transaction() as conn:
+            conn.execute("DELETE FROM signin_log WHERE day < ?", (cutoff,))
+        self.storage.prune_history(ACCOUNT_HISTORY_RETENTION_DAYS)
+
+    def append(self, entry: dict):
+        day = entry["time"][:10]
+        if day != self._current_day:
+            self._current_day = day
+            self.compact()
+        with self.storage.transaction() as conn:
+            conn.execute(
+                "INSERT INTO signin_log (day, time, status, message) VALUES (?, ?, ?, ?)",
+                (day, entry["time"], entry["status"], entry["message"]),
+            )
+        self._tail.append(entry)
+
+    def latest(self):
+        return self._tail[-1] if self._tail else None
+
+signin_journal = None
+if not IS_WORKER_PROCESS:  # worker 进程不读写签到日志
+    signin_journal = storage.make_journal()
+    signin_journal.load()
 
 def record_signin(status: str, message: str):
     """
-    记录签到日志到 JSON 文件
+    追加一条签到日志
     status: "success" 或 "fail"
     message: 提示信息
     """
     now_str = get_now().strftime("%Y-%m-%d %H:%M:%S %z")  # 带时区
-    logs = load_signin_logs()
-    logs.append({
+    signin_journal.append({
         "time": now_str,
         "status": status,
         "message": message.strip()
     })
-    save_signin_logs(logs)
-
-def escape_markdown(text: str) -> str:
-    escape_chars = r'\_*[]()~`>#+-=|{}.!'
-    for ch in escape_chars:
-        text = text.replace(ch, f'\\{ch}')
-    return text
 
 def handle_task_exception(task):
+    if task.cancelled():
+        return  # 退出时被取消，不算异常
     try:
         task.result()
     except Exception as e:
@@ -157,197 +1124,1346 @@ def handle_task_exception(task):
 def create_tracked_task(coro):
     task = asyncio.create_task(coro)
     task.add_done_callback(handle_task_exception)
+    task.add_done_callback(tasks.remove)  # 完成后移出列表，tasks 只保留仍在运行的任务
     tasks.append(task)
     return task
 
-# === 核心签到逻辑 ===
+async def drain_tasks(timeout: float):
+    """
+    退出前等待后台任务（/add 之后的签到等）完成，超时仍未完成的任务会被取消
+    """
+    pending = [task for task in tasks if not task.done()]
+    if not pending:
+        return
+    print(f"⏳ 等待 {len(pending)} 个后台任务完成（最多 {timeout:g} 秒）...")
+    _, pending = await asyncio.wait(pending, timeout=timeout)
+    if pending:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        print(f"⚠️ {len(pending)} 个后台任务未在 {timeout:g} 秒内完成，已取消")
+
+class RateLimiter:
+    """
+    异步限速器（GCRA 令牌桶）：平均每秒放行 rate 次，最多允许 burst 次突发；
+    burst=1 时即相邻两次放行的间隔不小于 1/rate 秒。rate <= 0 时不限速。
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.burst = max(1, burst)
+        self._next_slot = 0.0  # 理论上下一次放行的时间
 
-def check_signin_status(scraper, account_name, cookie_dict):
+    async def acquire(self):
+        if not self.interval:
+            return
+        # 先占位再等待，协程之间不会拿到同一个时间槽
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        wait = slot - now - (self.burst - 1) * self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+nodeseek_limiter = RateLimiter(SIGNIN_MAX_RPS)  # 所有发往 nodeseek.com 的请求共用
+
+# === 监控指标 ===
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # 标签值元组 -> 数值
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def samples(self):
+        if not self._values and not self.labelnames:
+            yield f"{self.name} 0"
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{self._format_labels(key)} {value}"
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+class Counter(_Metric):
     """
-    修改为调用api/attendance并根据其响应判断是否已签到。
+    单调递增计数；也可以传入 func，在导出时读取其他对象自己维护的累计值
     """
-    url_sign = "https://www.nodeseek.com/api/attendance?random=false"
+    kind = "counter"
 
-    headers = {
-        'Accept': '*/*',
-        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        'Content-Length': '0',
-        'Origin': 'https://www.nodeseek.com',
-        'Referer': 'https://www.nodeseek.com/board',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36',
-    }
+    def __init__(self, name: str, help_text: str, labelnames=(), func=None):
+        super().__init__(name, help_text, labelnames)
+        self.func = func
 
-    try:
-        response = scraper.post(url_sign, headers=headers, cookies=cookie_dict, timeout=30)
-        # 即使是错误状态码，也尝试解析JSON获取message
-        if response.status_code != 200:
-            try:
-                error_data = response.json()
-                msg_raw = error_data.get("message") or error_data.get("Message") or f"HTTP {response.status_code} 错误"
-                if "Unauthorized" in msg_raw or response.status_code == 401:
-                    return f"❌ `{wrap_md_code(account_name)}` Cookie失效或不正确"
-                elif "重复" in msg_raw or "请勿重复" in msg_raw:
-                    return f"✅ `{wrap_md_code(account_name)}` 已签到 (通过 /check 触发了重复签到)"
-                else:
-                    return f"❌ `{wrap_md_code(account_name)}` 状态检查失败: {msg_raw}"
-            except json.JSONDecodeError:
-                return f"❌ `{wrap_md_code(account_name)}` 状态检查失败，HTTP {response.status_code}，响应无法解析。"
-        
-        # 200 OK 响应处理
-        json_data = response.json()
-        msg_raw = json_data.get("message") or json_data.get("Message") or "未知消息"
-
-        if "签到收益" in msg_raw:
-            # 如果是首次签到成功，则表示之前未签到
-            return f"❌ `{wrap_md_code(account_name)}` 未签到 (通过 /check 触发了首次签到)"
-        elif "重复" in msg_raw or "请勿重复" in msg_raw:
-            return f"✅ `{wrap_md_code(account_name)}` 已签到"
-        elif "Unauthorized" in msg_raw:
-            return f"❌ `{wrap_md_code(account_name)}` Cookie失效或不正确"
-        else:
-            return f"❌ `{wrap_md_code(account_name)}` 状态未知: {msg_raw}"
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
 
-    except requests.exceptions.Timeout:
-        return f"❌ `{wrap_md_code(account_name)}` 状态检查超时。"
-    except requests.exceptions.RequestException as e:
-        return f"❌ `{wrap_md_code(account_name)}` 状态检查网络异常: {e}"
-    except json.JSONDecodeError:
-        return f"❌ `{wrap_md_code(account_name)}` 状态检查响应解析失败。"
-    except Exception as e:
-        logger.error("详细错误信息", exc_info=True)  # 打印完整错误堆栈到控制台
-        return f"❌ `{wrap_md_code(account_name)}` 状态检查发生未知错误: {e}"
-    
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
 
-def sign_in_single_account(account_name, cookie):
+    def samples(self):
+        if self.func is not None:
+            yield f"{self.name} {self.func()}"
+        else:
+            yield from super().samples()
+
+class Gauge(_Metric):
     """
-    单账号签到逻辑，完全模拟JS脚本，直接调用api/attendance并根据返回message判断结果。
-    不再预先调用 api/user。
+    可直接 set，也可以传入 func 在导出时实时取值
     """
-    url_sign = "https://www.nodeseek.com/api/attendance?random=false"
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), func=None):
+        super().__init__(name, help_text, labelnames)
+        self.func = func
 
-    scraper = create_scraper()
-    cookie_dict = parse_cookie(cookie)
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.func is not None:
+            yield f"{self.name} {self.func()}"
+        else:
+            yield from super().samples()
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state["counts"][i] += 1
+                break
+        state["sum"] += value
+        state["count"] += 1
+
+    def samples(self):
+        for key, state in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                yield f"{self.name}_bucket{self._format_labels(key, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_bucket{self._format_labels(key, [('le', '+Inf')])} {state['count']}"
+            yield f"{self.name}_sum{self._format_labels(key)} {state['sum']}"
+            yield f"{self.name}_count{self._format_labels(key)} {state['count']}"
+
+class MetricsRegistry:
+    """
+    进程内指标集合，以 Prometheus 文本格式导出。指标只在事件循环线程中更新。
+    """
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+SIGNIN_OUTCOMES = metrics.register(Counter(
+    "nodeseek_signin_outcomes_total", "签到/状态检查结果计数", ("op", "outcome")))
+ATTENDANCE_LATENCY = metrics.register(Histogram(
+    "nodeseek_attendance_request_seconds", "签到接口 POST 耗时", LATENCY_BUCKETS, ("backend",)))
+CLOUDFLARE_CHALLENGES = metrics.register(Counter(
+    "nodeseek_cloudflare_challenges_total", "httpx 请求被 Cloudflare 质询而回退 cloudscraper 的次数"))
+SIGNIN_RETRIES = metrics.register(Counter(
+    "nodeseek_signin_retries_total", "签到重试次数"))
+BATCH_DURATION = metrics.register(Histogram(
+    "nodeseek_batch_duration_seconds", "批量签到总耗时", (10, 30, 60, 120, 300, 600, 1200, 1800, 3600)))
+BATCH_ACCOUNTS = metrics.register(Gauge(
+    "nodeseek_batch_accounts", "最近一次批量签到的账号数"))
+BROADCAST_MESSAGES = metrics.register(Counter(
+    "telegram_broadcast_messages_total", "群发消息结果计数", ("result",)))
+BROADCAST_RETRIES = metrics.register(Counter(
+    "telegram_broadcast_retries_total", "群发重发次数"))
+BROADCAST_RATE = metrics.register(Gauge(
+    "telegram_broadcast_rate", "最近一次群发的实际发送速率（条/秒）"))
+BLOCKING_INFLIGHT = metrics.register(Gauge(
+    "nodeseek_blocking_executor_inflight", "阻塞请求线程池中正在执行或排队的任务数",
+    func=lambda: blocking_executor_inflight))
+BLOCKING_QUEUE_DEPTH = metrics.register(Gauge(
+    "nodeseek_blocking_executor_queue_depth", "阻塞请求线程池中等待空闲线程的任务数",
+    func=lambda: max(0, blocking_executor_inflight - BLOCKING_IO_WORKERS)))
+SCRAPER_POOL_HITS = metrics.register(Counter(
+    "nodeseek_scraper_pool_hits_total", "cloudscraper 会话池命中次数", func=lambda: scraper_pool.hits))
+SCRAPER_POOL_MISSES = metrics.register(Counter(
+    "nodeseek_scraper_pool_misses_total", "cloudscraper 会话池未命中（新建会话）次数", func=lambda: scraper_pool.misses))
+WEBHOOK_UPDATES = metrics.register(Counter(
+    "nodeseek_webhook_updates_total", "webhook 收到的请求数", ("status",)))
+CIRCUIT_TRIPS = metrics.register(Counter(
+    "nodeseek_circuit_trips_total", "签到接口熔断次数"))
+CIRCUIT_STATE = metrics.register(Gauge(
+    "nodeseek_circuit_open", "签到接口熔断器状态：0 正常，1 熔断中，2 探测中",
+    func=lambda: {"closed": 0, "open": 1, "half_open": 2}[circuit_breaker.state]))
+
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="nodeseek-io")
+blocking_executor_inflight = 0
+
+async def run_blocking(func, *args):
+    """
+    在专用线程池中执行阻塞调用（cloudscraper 等），并统计排队深度
+    """
+    global blocking_executor_inflight
+    blocking_executor_inflight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(blocking_executor, func, *args)
+    finally:
+        blocking_executor_inflight -= 1
 
-    headers = {
-        'Accept': '*/*',
-        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        'Content-Length': '0', # POST请求体为空，所以长度为0
-        'Origin': 'https://www.nodeseek.com',
-        'Referer': 'https://www.nodeseek.com/board',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36',
-    }
+def parse_request_path(request_line: bytes):
+    """
+    从 HTTP 请求行（如 b"GET /metrics HTTP/1.1"）中取出路径，格式不对或不是 ASCII 时返回 None
+    """
+    try:
+        _, target, _ = request_line.decode("ascii").split()
+    except (UnicodeDecodeError, ValueError):
+        return None
+    return target.split("?")[0]
 
+async def handle_metrics_request(reader, writer):
     try:
-        resp_sign = scraper.post(url_sign, headers=headers, cookies=cookie_dict, timeout=30)
-        resp_sign.raise_for_status() # 对4xx/5xx状态码抛出HTTPError
-
-        json_data = resp_sign.json()
-        # 兼容 message 和 Message 字段
-        msg_raw = json_data.get("message") or json_data.get("Message") or "未知消息"
-        
-        # 签到成功判断
-        if "签到收益" in msg_raw:
-            match = re.search(r'(\d+)', msg_raw) # 使用正则表达式提取数字
-            amount = match.group(1) if match else "未知"
-            msg = f"✅ 账号 `{wrap_md_code(account_name)}` 签到成功，收益 {amount} 个🍗"
-            print(msg)
-            return msg
-        # 重复签到判断：JS脚本就是通过这里判断已签到的
-        elif "重复" in msg_raw or "请勿重复" in msg_raw:
-            msg = f"⚠️ 账号 `{wrap_md_code(account_name)}` 今天已签到（重复签到）。"
-            print(msg)
-            return msg
-        # Cookie失效判断：虽然不调用api/user，但api/attendance也可能返回类似信息
-        elif "Unauthorized" in msg_raw or resp_sign.status_code == 401:
-            msg = f"❌ 账号 `{wrap_md_code(account_name)}` Cookie已失效或不正确。"
-            print(msg)
-            return msg
-        # 其他失败情况
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass  # 丢弃请求头
+        except ValueError:
+            request_line = b""  # 单行超过读取上限，按格式错误处理
+        path = parse_request_path(request_line)
+        if path is None:
+            status, body = "400 Bad Request", b"bad request\n"
+        elif path == "/metrics":
+            status, body = "200 OK", metrics.render().encode()
         else:
-            msg = f"❌ 账号 `{wrap_md_code(account_name)}` 签到失败: {msg_raw}"
-            print(msg)
-            return msg
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def start_metrics_server():
+    """
+    METRICS_PORT > 0 时在本地启动 /metrics 端点
+    """
+    if METRICS_PORT <= 0:
+        return None
+    server = await asyncio.start_server(handle_metrics_request, METRICS_HOST, METRICS_PORT)
+    print(f"📈 指标端点已启动: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    return server
+
+# === 签到请求传输层 ===
+
+ATTENDANCE_URL = f"{NODESEEK_BASE_URL}/api/attendance?random=false"
+ATTENDANCE_HEADERS = {
+    'Accept': '*/*',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Content-Length': '0', # POST请求体为空，所以长度为0
+    'Origin': NODESEEK_BASE_URL,
+    'Referer': f'{NODESEEK_BASE_URL}/board',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36',
+}
+
+class AttendanceError(Exception):
+    """
+    签到请求在拿到响应之前失败
+    """
+
+class AttendanceTimeout(AttendanceError):
+    pass
+
+class AttendanceNetworkError(AttendanceError):
+    pass
 
-    except requests.exceptions.HTTPError as e:
-        # 处理HTTP错误状态码 (例如401 Unauthorized, 403 Forbidden等)
+class AttendanceChallenge(AttendanceError):
+    """
+    cloudscraper 没能通过 Cloudflare 质询（与 httpx 收到质询页同样处理）
+    """
+
+class AttendanceResponse:
+    """
+    与具体 HTTP 库无关的签到响应
+    """
+    __slots__ = ("status_code", "text", "challenged")
+
+    def __init__(self, status_code: int, text: str, challenged: bool = False):
+        self.status_code = status_code
+        self.text = text
+        self.challenged = challenged  # 是否被 Cloudflare 质询页拦截
+
+    def json(self):
+        return json.loads(self.text)
+
+def is_cloudflare_challenge(status_code, headers, text):
+    """
+    判断响应是否为 Cloudflare 质询页（普通 HTTP 客户端无法通过）
+    """
+    if status_code not in (403, 429, 503):
+        return False
+    if headers.get("cf-mitigated", "").lower() == "challenge":
+        return True
+    return "cloudflare" in headers.get("server", "").lower() and (
+        "Just a moment" in text or "challenge-platform" in text
+    )
+
+class CloudscraperTransport:
+    """
+    原有的 cloudscraper 请求方式，能处理 Cloudflare 质询，但会占用一个线程
+    """
+    name = "cloudscraper"
+
+    def _post(self, account_name, cookie_dict, timeout):
         try:
-            # 尝试解析错误响应中的JSON消息
-            error_data = e.response.json()
-            error_message = error_data.get("message") or error_data.get("Message") or f"HTTP {e.response.status_code} 错误"
-            
-            # 在HTTPError中也判断是否是Cookie失效
-            if "Unauthorized" in error_message or e.response.status_code == 401:
-                msg = f"❌ 账号 `{wrap_md_code(account_name)}` Cookie已失效或不正确。"
-            else:
-                msg = f"❌ 账号 `{wrap_md_code(account_name)}` 签到请求失败: {error_message}"
-        except json.JSONDecodeError:
-            msg = f"❌ 账号 `{wrap_md_code(account_name)}` 签到请求失败，HTTP {e.response.status_code}，响应无法解析。"
-        print(msg)
-        return msg
-    except requests.exceptions.Timeout:
-        msg = f"❌ 账号 `{wrap_md_code(account_name)}` 签到请求超时。"
-        print(msg)
-        return msg
-    except requests.exceptions.RequestException as e:
-        msg = f"❌ 账号 `{wrap_md_code(account_name)}` 签到请求网络异常: {e}"
-        print(msg)
-        return msg
+            with scraper_pool.session(account_name) as scraper:
+                resp = scraper.post(ATTENDANCE_URL, headers=ATTENDANCE_HEADERS, cookies=cookie_dict, timeout=timeout)
+        except requests.exceptions.Timeout as e:
+            raise AttendanceTimeout(str(e)) from e
+        except requests.exceptions.RequestException as e:
+            raise AttendanceNetworkError(str(e)) from e
+        except (cloudscraper.exceptions.CloudflareException, cloudscraper.exceptions.CaptchaException) as e:
+            raise AttendanceChallenge(f"{type(e).__name__}: {e}") from e
+        return AttendanceResponse(resp.status_code, resp.text)
+
+    async def post(self, account_name, cookie_dict, timeout=30):
+        return await run_blocking(self._post, account_name, cookie_dict, timeout)
+
+    async def aclose(self):
+        pass
+
+class HttpxTransport:
+    """
+    基于 httpx.AsyncClient 的原生异步请求，直接运行在 Bot 的事件循环上，不占用线程
+    """
+    name = "httpx"
+
+    def __init__(self, max_connections: int = 100):
+        self.max_connections = max_connections
+        self._client = None
+        self._client_loop = None
+
+    def _get_client(self):
+        # AsyncClient 的连接绑定在创建它的事件循环上，换了循环就重建
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                headers={k: v for k, v in ATTENDANCE_HEADERS.items() if k != 'Content-Length'},
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                follow_redirects=True,
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def post(self, account_name, cookie_dict, timeout=30):
+        # 每个请求显式带上该账号的 Cookie 头，客户端本身不保存任何账号的 cookie
+        headers = {"Cookie": "; ".join(f"{k}={v}" for k, v in cookie_dict.items())}
+        try:
+            resp = await self._get_client().post(ATTENDANCE_URL, headers=headers, timeout=timeout)
+        except httpx.TimeoutException as e:
+            raise AttendanceTimeout(str(e) or "timeout") from e
+        except httpx.HTTPError as e:
+            raise AttendanceNetworkError(str(e) or e.__class__.__name__) from e
+        challenged = is_cloudflare_challenge(resp.status_code, resp.headers, resp.text)
+        return AttendanceResponse(resp.status_code, resp.text, challenged)
+
+    async def aclose(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            try:
+                await client.aclose()
+            except RuntimeError:
+                pass  # 所属事件循环已关闭
+
+class FallbackTransport:
+    """
+    优先使用 primary；遇到 Cloudflare 质询时改用 fallback 重发，
+    并在 sticky_seconds 内直接走 fallback，避免每个请求都被质询一次。
+    """
+    def __init__(self, primary, fallback, sticky_seconds: float = 600):
+        self.primary = primary
+        self.fallback = fallback
+        self.sticky_seconds = sticky_seconds
+        self._fallback_until = 0.0
+        self.name = f"{primary.name}+{fallback.name}"
+
+    async def post(self, account_name, cookie_dict, timeout=30):
+        if time.monotonic() >= self._fallback_until:
+            resp = await self.primary.post(account_name, cookie_dict, timeout)
+            if not resp.challenged:
+                return resp
+            logger.warning(f"{self.primary.name} 请求被 Cloudflare 质询，改用 {self.fallback.name}")
+            CLOUDFLARE_CHALLENGES.inc()
+            self._fallback_until = time.monotonic() + self.sticky_seconds
+        return await self.fallback.post(account_name, cookie_dict, timeout)
+
+    async def aclose(self):
+        await self.primary.aclose()
+        await self.fallback.aclose()
+
+def build_attendance_transport(backend: str):
+    """
+    按配置创建签到请求后端：httpx / cloudscraper / auto（httpx 优先，被质询时回退 cloudscraper）
+    """
+    backend = backend.lower()
+    if backend == "cloudscraper":
+        return CloudscraperTransport()
+    if backend == "httpx":
+        return HttpxTransport()
+    if backend != "auto":
+        logger.warning(f"未知的 ATTENDANCE_BACKEND={backend}，使用 auto")
+    return FallbackTransport(HttpxTransport(), CloudscraperTransport())
+
+attendance_transport = build_attendance_transport(ATTENDANCE_BACKEND)
+
+async def post_attendance(account_name, cookie_dict, timeout=30):
+    """
+    发送签到请求并记录耗时
+    """
+    started = time.perf_counter()
+    try:
+        return await attendance_transport.post(account_name, cookie_dict, timeout)
+    finally:
+        ATTENDANCE_LATENCY.observe(time.perf_counter() - started, backend=attendance_transport.name)
+
+# === 核心签到逻辑 ===
+
+class SigninOutcome(Enum):
+    SUCCESS = "success"  # 签到成功（/check 时表示此前未签到）
+    DUPLICATE = "duplicate"  # 今天已签到
+    COOKIE_INVALID = "cookie_invalid"
+    TIMEOUT = "timeout"
+    NETWORK_ERROR = "network_error"
+    CHALLENGE = "challenge"  # 被 Cloudflare 质询页拦截
+    CIRCUIT_OPEN = "circuit_open"  # 熔断中，请求未发出
+    HTTP_ERROR = "http_error"
+    PARSE_ERROR = "parse_error"
+    UNKNOWN = "unknown"  # 200 但 message 无法识别
+    ERROR = "error"  # 代码内部的未知异常
+
+@dataclass(slots=True)
+class SigninResult:
+    """
+    一次签到/状态检查的结构化结果，只在发送给用户时才渲染为 Markdown
+    """
+    account: str
+    outcome: SigninOutcome
+    reward: int | None = None  # 签到收益（鸡腿数）
+    http_status: int | None = None
+    latency: float = 0.0  # 请求耗时（秒）
+    error_class: str | None = None  # 异常类名
+    message: str | None = None  # 接口返回的 message 或异常信息
+    attempts: int = 1  # 得到该结果时已尝试的次数
+    cached: bool = False  # 是否直接取自缓存（未发请求）
+
+    @property
+    def ok(self):
+        return self.outcome in (SigninOutcome.SUCCESS, SigninOutcome.DUPLICATE)
+
+def classify_attendance_response(account_name, response):
+    """
+    根据 api/attendance 的响应判断结果，签到与 /check 共用
+    """
+    status = response.status_code
+    if response.challenged:
+        return SigninResult(account_name, SigninOutcome.CHALLENGE, http_status=status)
+    try:
+        data = response.json()
     except json.JSONDecodeError:
-        msg = f"❌ 账号 `{wrap_md_code(account_name)}` 签到响应解析失败。"
-        print(msg)
-        return msg
+        outcome = SigninOutcome.HTTP_ERROR if status >= 400 else SigninOutcome.PARSE_ERROR
+        return SigninResult(account_name, outcome, http_status=status, error_class="JSONDecodeError")
+    if not isinstance(data, dict):
+        data = {}
+    # 兼容 message 和 Message 字段
+    msg_raw = data.get("message") or data.get("Message")
+
+    # 处理HTTP错误状态码 (例如401 Unauthorized, 403 Forbidden等)，即使是错误状态码也尝试从JSON获取message
+    if status >= 400:
+        msg_raw = msg_raw or f"HTTP {status} 错误"
+        if "Unauthorized" in msg_raw or status == 401:
+            outcome = SigninOutcome.COOKIE_INVALID
+        elif "重复" in msg_raw:
+            outcome = SigninOutcome.DUPLICATE
+        else:
+            outcome = SigninOutcome.HTTP_ERROR
+        return SigninResult(account_name, outcome, http_status=status, message=msg_raw)
+
+    msg_raw = msg_raw or "未知消息"
+    if "签到收益" in msg_raw:
+        match = re.search(r'(\d+)', msg_raw) # 使用正则表达式提取数字
+        reward = int(match.group(1)) if match else None
+        return SigninResult(account_name, SigninOutcome.SUCCESS, reward=reward, http_status=status, message=msg_raw)
+    # 重复签到判断：JS脚本就是通过这里判断已签到的
+    if "重复" in msg_raw:
+        return SigninResult(account_name, SigninOutcome.DUPLICATE, http_status=status, message=msg_raw)
+    # Cookie失效判断：虽然不调用api/user，但api/attendance也可能返回类似信息
+    if "Unauthorized" in msg_raw:
+        return SigninResult(account_name, SigninOutcome.COOKIE_INVALID, http_status=status, message=msg_raw)
+    return SigninResult(account_name, SigninOutcome.UNKNOWN, http_status=status, message=msg_raw)
+
+TRANSIENT_OUTCOMES = (SigninOutcome.TIMEOUT, SigninOutcome.NETWORK_ERROR, SigninOutcome.CHALLENGE)
+
+def is_transient_failure(result: SigninResult):
+    """
+    超时、网络异常、5xx 和 Cloudflare 质询视为上游暂时性故障
+    """
+    if result.outcome in TRANSIENT_OUTCOMES:
+        return True
+    return result.outcome is SigninOutcome.HTTP_ERROR and (result.http_status or 0) >= 500
+
+class CircuitBreaker:
+    """
+    签到接口熔断器：连续 failure_threshold 次上游故障后熔断（open），cooldown 秒内不再发请求；
+    冷却结束后只放行一个账号作为探测（half_open），探测成功才恢复（closed），失败则重新熔断。
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0  # 连续故障次数
+        self.trips = 0  # 累计熔断次数
+        self._open_until = 0.0
+        self._probe_done = None  # 半开状态下等待探测结果的 Event
+
+    async def acquire(self, deadline: float | None = None):
+        """
+        请求前调用，返回是否允许发出请求。
+        deadline 为 None 时熔断中立即拒绝；否则最多等待到 deadline（time.monotonic() 时间）
+        """
+        while True:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now >= self._open_until:
+                    # 冷却结束，由当前请求作为探测
+                    self.state = self.HALF_OPEN
+                    self._probe_done = asyncio.Event()
+                    print("🟡 熔断冷却结束，使用单个账号探测 nodeseek.com...")
+                    return True
+                if deadline is None or now >= deadline:
+                    return False
+                await asyncio.sleep(min(self._open_until, deadline) - now)
+                continue
+            # 半开：等待探测结果
+            if deadline is None or now >= deadline:
+                return False
+            try:
+                await asyncio.wait_for(self._probe_done.wait(), deadline - now)
+            except asyncio.TimeoutError:
+                return False
+
+    def rejects(self, deadline: float | None = None):
+        """
+        不等待地判断 acquire(deadline) 是否必然拒绝，熔断时据此跳过限速和随机延迟
+        """
+        if self.state == self.CLOSED:
+            return False
+        if self.state == self.OPEN and time.monotonic() >= self._open_until:
+            return False  # 冷却已结束，下一个请求将作为探测
+        if deadline is None:
+            return True
+        return self.state == self.OPEN and self._open_until > deadline
+
+    def retry_after(self):
+        """
+        距离冷却结束（可以发出探测）还有多少秒；半开或正常时为 0
+        """
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self._open_until - time.monotonic())
+
+    def record(self, result: SigninResult):
+        """
+        根据请求结果更新熔断状态
+        """
+        if is_transient_failure(result):
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self._trip()
+            return
+        if self.state != self.CLOSED:
+            print("🟢 nodeseek.com 探测成功，熔断恢复")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._release_waiters()
+
+    def abort_probe(self):
+        """
+        请求没有得到结果（抛出异常或被取消）时调用：若它是半开状态下的探测，按失败处理重新熔断，
+        否则熔断器会一直停在半开状态，其余请求永远等不到探测结果
+        """
+        if self.state == self.HALF_OPEN:
+            self.failures += 1
+            self._trip()
+
+    def _trip(self):
+        self.state = self.OPEN
+        self.trips += 1
+        self._open_until = time.monotonic() + self.cooldown
+        CIRCUIT_TRIPS.inc()
+        print(f"🔴 nodeseek.com 连续 {self.failures} 次请求失败，熔断 {self.cooldown:.0f}s")
+        self._release_waiters()  # 等待探测的请求回到 OPEN 分支继续等待冷却
+
+    def _release_waiters(self):
+        if self._probe_done is not None:
+            self._probe_done.set()
+            self._probe_done = None
+
+    def describe(self):
+        """
+        用于 /last 和签到汇总的状态描述
+        """
+        if self.state == self.CLOSED:
+            text = "🟢 正常"
+        elif self.state == self.HALF_OPEN:
+            text = "🟡 探测中"
+        else:
+            remaining = max(0, self._open_until - time.monotonic())
+            text = f"🔴 熔断中（{remaining:.0f}s 后探测，连续失败 {self.failures} 次）"
+        if self.trips:
+            text += f"，累计熔断 {self.trips} 次"
+        return text
+
+circuit_breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN)
+
+async def request_attendance(account_name, cookie_dict):
+    """
+    发送一次签到请求并分类结果，不更新任何状态（签到 worker 进程直接调用）
+    """
+    started = time.perf_counter()
+    try:
+        response = await post_attendance(account_name, cookie_dict)
+        result = classify_attendance_response(account_name, response)
+    except AttendanceTimeout as e:
+        result = SigninResult(account_name, SigninOutcome.TIMEOUT, error_class=type(e).__name__, message=str(e))
+    except AttendanceNetworkError as e:
+        result = SigninResult(account_name, SigninOutcome.NETWORK_ERROR, error_class=type(e).__name__, message=str(e))
+    except AttendanceChallenge as e:
+        result = SigninResult(account_name, SigninOutcome.CHALLENGE, error_class=type(e).__name__, message=str(e))
     except Exception as e:
-        msg = f"❌ 账号 `{wrap_md_code(account_name)}` 签到发生未知错误: {e}"
-        print(msg)
         logger.error("详细错误信息", exc_info=True)  # 打印完整错误堆栈到控制台
-        return msg
+        result = SigninResult(account_name, SigninOutcome.ERROR, error_class=type(e).__name__, message=str(e))
+    result.latency = time.perf_counter() - started
+    return result
+
+async def attempt_attendance(account_name, cookie_dict, op: str, deadline: float | None = None):
+    """
+    发送一次签到请求并返回 SigninResult；op 为 signin 或 check，仅用于指标区分。
+    熔断中时不发请求，deadline 含义见 CircuitBreaker.acquire
+    """
+    if not await circuit_breaker.acquire(deadline):
+        SIGNIN_OUTCOMES.inc(op=op, outcome=SigninOutcome.CIRCUIT_OPEN.value)
+        return SigninResult(account_name, SigninOutcome.CIRCUIT_OPEN)
+    result = None
+    try:
+        if sign_in_workers is not None:
+            result = await sign_in_workers.request(account_name, cookie_dict)
+            ATTENDANCE_LATENCY.observe(result.latency, backend="worker")
+        else:
+            result = await request_attendance(account_name, cookie_dict)
+    finally:
+        if result is None:
+            circuit_breaker.abort_probe()
+    circuit_breaker.record(result)
+    cookie_health.record(result, cookie_dict)
+    daily_outcomes.record(result)
+    SIGNIN_OUTCOMES.inc(op=op, outcome=result.outcome.value)
+    return result
+
+class RetryPolicy:
+    """
+    签到重试策略：只重试超时、网络异常、5xx 和 Cloudflare 质询这类暂时性错误，
+    按指数退避（带随机抖动）计算等待时间；预算用完后不再重试。
+    定时签到、/retry 和 /add 后的签到共用 retry_policy 的预算，每天恢复一次；
+    /force 的批量签到每次使用自己的一份预算，不会在白天重置定时签到依赖的上限。
+    """
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float, budget: int):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.remaining = budget
+
+    def reset(self):
+        """
+        新一轮签到开始时恢复重试预算
+        """
+        self.remaining = self.budget
+
+    def should_retry(self, result: SigninResult):
+        """
+        判断是否重试；返回 True 时已从预算中扣除一次
+        """
+        if result.attempts >= self.max_attempts or not is_transient_failure(result):
+            return False
+        if self.remaining <= 0:
+            print(f"⚠️ 本轮重试预算已用完，账号 {result.account} 不再重试")
+            return False
+        self.remaining -= 1
+        SIGNIN_RETRIES.inc()
+        return True
+
+    def backoff(self, attempts: int):
+        """
+        第 attempts 次尝试失败后的等待时间：base * 2^(attempts-1)，取上限后在 [d/2, d] 内随机
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return random.uniform(delay / 2, delay)
+
+def new_retry_policy():
+    """
+    按配置创建一份带完整预算的重试策略
+    """
+    return RetryPolicy(SIGNIN_MAX_ATTEMPTS, SIGNIN_RETRY_BASE_DELAY, SIGNIN_RETRY_MAX_DELAY, SIGNIN_RETRY_BUDGET)
+
+retry_policy = new_retry_policy()  # 定时签到、/retry、/add 共用，每天恢复
+
+inflight_attendance = {}  # 账号名 -> 正在进行的签到请求（asyncio.Future）
 
-async def sign_in_all_accounts_async():
+async def single_flight(account_name, factory, deadline: float | None = None, op: str = "signin"):
     """
-    异步批量签到所有账号，加入重试机制，并防止重复签到。
+    同一账号同一时刻只发一个签到请求：已有请求在进行时，后来的调用方等待同一个结果，
+    不再重复请求。每个调用方拿到结果的副本，可以各自修改 attempts 等字段。
+    熔断时先按调用方自己的 deadline 判断：进行中的请求可能在等待更长的熔断冷却，
+    /check、/retry 这类不等待的调用方不能跟着它一起等。
     """
-    global last_signin_result, last_signin_time, is_signing_in
+    flight = inflight_attendance.get(account_name)
+    if flight is not None and circuit_breaker.rejects(deadline):
+        SIGNIN_OUTCOMES.inc(op=op, outcome=SigninOutcome.CIRCUIT_OPEN.value)
+        return SigninResult(account_name, SigninOutcome.CIRCUIT_OPEN)
+    if flight is None:
+        flight = asyncio.ensure_future(factory())
+        inflight_attendance[account_name] = flight
+
+        def forget(done):
+            if inflight_attendance.get(account_name) is done:
+                del inflight_attendance[account_name]
+        flight.add_done_callback(forget)
+    return replace(await asyncio.shield(flight))
+
+async def check_signin_status(account_name, cookie_dict):
+    """
+    修改为调用api/attendance并根据其响应判断是否已签到，返回 SigninResult。
+    今天已签到的账号直接返回记录；与同一账号正在进行的签到合并为一次请求。
+    """
+    memo = daily_outcomes.get(account_name)
+    if memo is not None:
+        return memo
+    return await single_flight(account_name, lambda: attempt_attendance(account_name, cookie_dict, "check"), op="check")
+
+async def sign_in_single_account(account_name, cookie, deadline: float | None = None):
+    """
+    单账号签到逻辑，完全模拟JS脚本，直接调用api/attendance并根据返回message判断结果。
+    不再预先调用 api/user。请求经由 attendance_transport 发出，返回 SigninResult。
+    """
+    result = await attempt_attendance(account_name, parse_cookie(cookie), "signin", deadline)
+    print(render_signin_result(result))
+    return result
+
+def result_status(result: SigninResult):
+    """
+    把签到结果归类为 success / already / fail，用于单账号历史统计
+    """
+    if result.outcome is SigninOutcome.SUCCESS:
+        return "success"
+    if result.outcome is SigninOutcome.DUPLICATE:
+        return "already"
+    return "fail"
+
+async def run_sign_in(account_name, cookie, deadline: float | None = None):
+    """
+    单账号签到的统一入口（批量签到、定时签到、/retry、/add 后的签到）：
+    今天已签到的账号直接返回当天的记录，不再请求；同一账号并发的签到合并为一次请求。
+    """
+    memo = daily_outcomes.get(account_name)
+    if memo is not None:
+        return memo
+    return await single_flight(account_name, lambda: _run_sign_in(account_name, cookie, deadline), deadline)
+
+async def _run_sign_in(account_name, cookie, deadline):
+    """
+    经过全局限速后执行单账号签到，并记录到单账号历史（熔断中必然跳过的账号不占用限速额度）
+    """
+    if not circuit_breaker.rejects(deadline):
+        await nodeseek_limiter.acquire()
+    result = await sign_in_single_account(account_name, cookie, deadline)
+    storage.record_account_result(account_name, result_status(result), render_signin_result(result))
+    return result
+
+async def sign_in_with_retry(account_name, cookie):
+    """
+    单独为一个账号签到（/retry、/add 后的签到），按 retry_policy 原地等待后重试
+    """
+    result = await run_sign_in(account_name, cookie)
+    while retry_policy.should_retry(result):
+        delay = retry_policy.backoff(result.attempts)
+        print(f"⚠️ 账号 {account_name} 第 {result.attempts} 次签到失败（{result.outcome.value}），{delay:.1f}s 后重试...")
+        await asyncio.sleep(delay)
+        attempts = result.attempts + 1
+        result = await run_sign_in(account_name, cookie)
+        result.attempts = attempts
+    if result.ok:
+        signin_scheduler.mark_completed(account_name)
+    return result
+
+async def publish_signin_summary(results, label=None, tripped=0):
+    """
+    缓存并推送一轮签到的汇总（results 按账号原有顺序排列）
+    """
+    global last_signin_result, last_signin_time
+    last_signin_time = get_now()
+    last_signin_result = render_batch_summary(results)
+    last_signin_result += f"\n\n🔌 上游状态: {circuit_breaker.describe()}"
+    if tripped:
+        last_signin_result += f"（本轮熔断 {tripped} 次）"
+
+    # 只推送一次，不再重复触发签到
+    title = f"📋 *NodeSeek 签到完成*（{label}）" if label else "📋 *NodeSeek 签到完成*"
+    await send_tg_notification_async(f"{title}\n\n{last_signin_result}")
+
+async def sign_in_all_accounts_async(job=None):
+    """
+    异步批量签到所有账号（/force）：SIGNIN_CONCURRENCY 个 worker 并发处理，
+    每个 worker 在自己的账号之间保留随机延迟，所有请求受全局限速约束。
+    传入 job（BatchJob）时逐个账号汇报进度；被取消时汇总已完成的账号后再抛出 CancelledError。
+    已有签到任务在进行时返回 False，否则返回 True。
+    """
+    global is_signing_in
     if is_signing_in:
         print("⚠️ 正在执行签到任务，跳过本次触发。")
-        return
+        return False
 
     is_signing_in = True
     try:
-        if not accounts:
+        # 快照，避免签到期间 /add、/delete 修改列表
+        batch = list(accounts)
+        if job is not None:
+            job.begin(len(batch))
+        if not batch:
             print("⚠️ 无账号可签到")
-            return
+            return True
+
+        results = [None] * len(batch)
+        pending = len(batch)
+        all_done = asyncio.Event()
+        queue = asyncio.Queue()
+        skipped = recorded = 0
+        for index, acc in enumerate(batch):
+            # 今天已有结果的账号直接沿用记录，不占用 worker 也不做随机延迟；
+            # Cookie 已确认失效的账号不再请求，直接计入“需要更新 Cookie”列表
+            cached = daily_outcomes.get(acc['name'])
+            if cached is not None:
+                recorded += 1
+                if cached.ok:
+                    signin_scheduler.mark_completed(cached.account)
+            else:
+                cached = cookie_health.cached_result(acc['name'], parse_cookie(acc['cookie']))
+                if cached is not None:
+                    skipped += 1
+            if cached is not None:
+                results[index] = cached
+                pending -= 1
+                if job is not None:
+                    job.advance(cached)
+            else:
+                queue.put_nowait((index, acc, 1))
+        if not pending:
+            all_done.set()
+        batch_retry = new_retry_policy()  # 独立预算，不影响共用的 retry_policy
+        loop = asyncio.get_running_loop()
+        trips_before = circuit_breaker.trips
+        circuit_deadline = time.monotonic() + CIRCUIT_MAX_WAIT  # 熔断时最多等到这里，之后剩余账号直接跳过
+
+        async def worker():
+            nonlocal pending
+            while True:
+                index, acc, attempt = await queue.get()
+                if attempt == 1 and not circuit_breaker.rejects(circuit_deadline):
+                    # 首次签到前随机延迟；重试的等待已由退避时间负责，熔断中必然跳过的账号也无需等待
+                    delay_sec = random.uniform(SIGNIN_JITTER_MIN, SIGNIN_JITTER_MAX)
+                    print(f"⏳ {acc['name']} 延迟 {delay_sec:.1f}s 后签到...")
+                    await asyncio.sleep(delay_sec)
+                try:
+                    result = await run_sign_in(acc['name'], acc['cookie'], circuit_deadline)
+                except Exception as e:
+                    logger.error("详细错误信息", exc_info=True)  # 打印完整错误堆栈到控制台
+                    result = SigninResult(acc['name'], SigninOutcome.ERROR, error_class=type(e).__name__, message=str(e))
+                result.attempts = attempt
+
+                if batch_retry.should_retry(result):
+                    # 退避结束后放回队尾，不占用 worker，也不挡住后面等待的账号
+                    delay = batch_retry.backoff(attempt)
+                    print(f"⚠️ 账号 {acc['name']} 第 {attempt} 次签到失败（{result.outcome.value}），{delay:.1f}s 后重新排队...")
+                    loop.call_later(delay, queue.put_nowait, (index, acc, attempt + 1))
+                    continue
+
+                results[index] = result
+                if result.ok:
+                    signin_scheduler.mark_completed(result.account)  # 逐个记录，中途取消也不会重复签到
+                if job is not None:
+                    job.advance(result)
+                pending -= 1
+                if pending == 0:
+                    all_done.set()
+
+        started = time.monotonic()
+        worker_count = max(1, min(SIGNIN_CONCURRENCY, pending))
+        workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
+        cancelled = False
+        try:
+            await all_done.wait()
+        except asyncio.CancelledError:
+            cancelled = True
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        if cancelled:
+            # 只汇总已完成的账号，其余账号留给定时签到
+            finished = [result for result in results if result is not None]
+            print(f"🛑 批量签到已取消，完成 {len(finished)}/{len(batch)} 个账号")
+            await publish_signin_summary(
+                finished, label=f"已取消，完成 {len(finished)}/{len(batch)} 个", tripped=circuit_breaker.trips - trips_before
+            )
+            raise asyncio.CancelledError()
+        elapsed = time.monotonic() - started
+        BATCH_DURATION.observe(elapsed)
+        BATCH_ACCOUNTS.set(len(batch))
+        print(f"🏁 {len(batch)} 个账号签到完成，并发 {worker_count}，耗时 {elapsed:.1f}s，"
+              f"重试 {batch_retry.budget - batch_retry.remaining} 次，跳过失效 Cookie {skipped} 个，沿用今日结果 {recorded} 个")
+        print(f"♻️ 会话池统计: {scraper_pool.stats()}")
+
+        await publish_signin_summary(results, tripped=circuit_breaker.trips - trips_before)
+        return True
+    finally:
+        is_signing_in = False
 
-        summary = []
-        for acc in accounts:
-            delay_sec = random.randint(3, 6)
-            print(f"⏳ {acc['name']} 延迟 {delay_sec}s 后签到...")
-            await asyncio.sleep(delay_sec)
-
-            # 第一次尝试
-            result = await asyncio.to_thread(sign_in_single_account, acc['name'], acc['cookie'])
-
-            # 如果出现错误，尝试判断是否需要重试
-            if result.startswith("❌") or "失败" in result or "异常" in result:
-                print(f"⚠️ 账号 {acc['name']} 第一次签到失败，准备重试...")
-                await asyncio.sleep(3)  # 可调，避免立即连发请求
-                retry_result = await asyncio.to_thread(sign_in_single_account, acc['name'], acc['cookie'])
-
-                # 标记为“重试成功”或“重试失败”
-                if not retry_result.startswith("❌"):
-                    result = f"✅（重试成功）{retry_result}"
-                else:
-                    result = f"❌（重试失败）{retry_result}"
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}秒"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}分{seconds:02d}秒"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}小时{minutes:02d}分"
+
+class BatchJob:
+    """
+    后台运行的一次批量签到：记录进度（已完成/总数）、成功失败数和预计剩余时间，可被取消；
+    结束（完成、取消或出错）后依次调用 on_done 注册的回调，用于回复发起人和推送订阅者。
+    """
+    def __init__(self, job_id: int, requested_by=None):
+        self.id = job_id
+        self.requested_by = requested_by
+        self.state = "pending"  # pending / running / done / cancelled / failed
+        self.error = None
+        self.total = 0
+        self.done = 0
+        self.succeeded = 0
+        self.started_at = get_now()
+        self.finished_at = None
+        self._started = time.monotonic()
+        self._finished = None
+        self._task = None
+        self._callbacks = []
+
+    @property
+    def running(self):
+        return self.state in ("pending", "running")
+
+    def begin(self, total: int):
+        self.state = "running"
+        self.total = total
+
+    def advance(self, result: SigninResult):
+        self.done += 1
+        if result.ok:
+            self.succeeded += 1
+
+    def elapsed(self):
+        return (self._finished or time.monotonic()) - self._started
+
+    def eta(self):
+        """
+        按已完成账号的平均耗时估算剩余时间，还没有账号完成时返回 None
+        """
+        if not self.done or self.done >= self.total:
+            return None
+        return self.elapsed() / self.done * (self.total - self.done)
+
+    def on_done(self, callback):
+        self._callbacks.append(callback)
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            return True
+        return False
+
+    def describe(self):
+        """
+        /status 显示的进度文本
+        """
+        percent = f"（{self.done / self.total:.0%}）" if self.total else ""
+        lines = [f"📦 *签到任务 #{self.id}*（{self.started_at:%H:%M:%S} 开始）"]
+        if self.running:
+            eta = self.eta()
+            lines.append(f"🔄 进行中：{self.done}/{self.total}{percent}，已用 {format_duration(self.elapsed())}")
+            lines.append(f"⏱ 预计剩余：{format_duration(eta) if eta is not None else '计算中'}")
+        else:
+            label = {"done": "✅ 已完成", "cancelled": "🛑 已取消", "failed": "⚠️ 出错"}[self.state]
+            lines.append(f"{label}：{self.done}/{self.total}{percent}，耗时 {format_duration(self.elapsed())}")
+            if self.error:
+                lines.append(f"错误：{escape_markdown(self.error)}")
+        lines.append(f"成功 {self.succeeded} 个，失败 {self.done - self.succeeded} 个")
+        return "\n".join(lines)
+
+    async def _run(self):
+        try:
+            await sign_in_all_accounts_async(self)
+            self.state = "done"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise  # 取消需要继续向上传播，任务本身才会处于 cancelled 状态
+        except Exception as e:
+            logger.error("详细错误信息", exc_info=True)  # 打印完整错误堆栈到控制台
+            self.state, self.error = "failed", str(e)
+        finally:
+            self._finished = time.monotonic()
+            self.finished_at = get_now()
+            for callback in self._callbacks:
+                try:
+                    await callback(self)
+                except Exception:
+                    logger.error("详细错误信息", exc_info=True)  # 打印完整错误堆栈到控制台
+
+class BatchJobs:
+    """
+    批量签到任务登记表：同一时刻只运行一个任务，保留最近 keep 个任务供 /status 查询
+    """
+    def __init__(self, keep: int = 10):
+        self._next_id = 1
+        self._jobs = OrderedDict()  # 任务 ID -> BatchJob
+        self.keep = keep
+
+    @property
+    def current(self):
+        """
+        正在运行的任务，没有时为 None
+        """
+        latest = self.latest()
+        return latest if latest is not None and latest.running else None
+
+    def latest(self):
+        return next(reversed(self._jobs.values()), None)
+
+    def get(self, job_id: int):
+        return self._jobs.get(job_id)
+
+    def start(self, requested_by=None):
+        """
+        在后台启动一次批量签到并立即返回任务；已有批量签到在运行时返回 None
+        """
+        if self.current is not None or is_signing_in:
+            return None
+        job = BatchJob(self._next_id, requested_by)
+        job.total = len(accounts)  # 任务开始时会按账号快照重新设置
+        self._next_id += 1
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.keep:
+            self._jobs.popitem(last=False)
+        job._task = create_tracked_task(job._run())  # 登记到 tasks，退出时等待其结束
+        return job
+
+batch_jobs = BatchJobs()
+
+# === 消息渲染 ===
+# Bot 使用旧版 Markdown（parse_mode="Markdown"），特殊字符只有 _ * ` [ 四个；行内代码里不需要也无法转义
+MARKDOWN_SPECIAL_RE = re.compile(r"[_*`\[]")
+
+def _escape_char(match):
+    return "\\" + match[0]
 
-            summary.append(result)
+def escape_markdown(text: str) -> str:
+    """
+    转义旧版 Markdown 的特殊字符：一次正则扫描完成，不含特殊字符时原样返回
+    """
+    return MARKDOWN_SPECIAL_RE.sub(_escape_char, text)
 
-        # 缓存结果
-        last_signin_time = get_now()
-        last_signin_result = "\n".join(summary)
+@lru_cache(maxsize=MD_NAME_CACHE_SIZE)
+def wrap_md_code(text: str):
+    """
+    包成行内代码；行内代码里不能出现反引号，这种文本退回为转义后的普通文本。
+    结果只取决于文本本身，按 LRU 缓存最近用到的账号名
+    """
+    if not text or "`" in text:
+        return escape_markdown(text)
+    return f"`{text}`"
+
+# 除 SigninOutcome 外的几种特殊情况
+CACHED_OK = "cached_ok"  # 今天已有本地成功记录
+CACHED_OK_REWARD = "cached_ok_reward"  # 同上，且知道收益
+COOKIE_CACHED = "cookie_cached"  # Cookie 已被标记失效，未请求上游
+HTTP_BLANK = "http_blank"  # HTTP 错误且响应无法解析
+
+# 每种结果一个模板（预先绑定的 str.format），渲染时按 key 查表；可用字段：name、reward、message、status
+SIGNIN_TEMPLATES = {key: template.format for key, template in {
+    CACHED_OK: "✅ 账号 {name} 今天已签到（{message}）",
+    CACHED_OK_REWARD: "✅ 账号 {name} 今天已签到（{message}，收益 {reward} 个🍗）",
+    SigninOutcome.SUCCESS: "✅ 账号 {name} 签到成功，收益 {reward} 个🍗",
+    SigninOutcome.DUPLICATE: "⚠️ 账号 {name} 今天已签到（重复签到）。",
+    SigninOutcome.COOKIE_INVALID: "❌ 账号 {name} Cookie已失效或不正确。",
+    COOKIE_CACHED: "❌ 账号 {name} Cookie已失效或不正确。",
+    SigninOutcome.HTTP_ERROR: "❌ 账号 {name} 签到请求失败: {message}",
+    HTTP_BLANK: "❌ 账号 {name} 签到请求失败，HTTP {status}，响应无法解析。",
+    SigninOutcome.TIMEOUT: "❌ 账号 {name} 签到请求超时。",
+    SigninOutcome.NETWORK_ERROR: "❌ 账号 {name} 签到请求网络异常: {message}",
+    SigninOutcome.CHALLENGE: "❌ 账号 {name} 签到请求被 Cloudflare 拦截。",
+    SigninOutcome.CIRCUIT_OPEN: "⏸️ 账号 {name} 未签到：nodeseek.com 暂时不可用（熔断中）。",
+    SigninOutcome.PARSE_ERROR: "❌ 账号 {name} 签到响应解析失败。",
+    SigninOutcome.UNKNOWN: "❌ 账号 {name} 签到失败: {message}",
+    SigninOutcome.ERROR: "❌ 账号 {name} 签到发生未知错误: {message}",
+}.items()}
+
+# /check 的结果：签到接口返回“签到收益”说明此前未签到
+CHECK_TEMPLATES = {key: template.format for key, template in {
+    CACHED_OK: "✅ {name} 已签到（{message}）",
+    CACHED_OK_REWARD: "✅ {name} 已签到（{message}）",
+    SigninOutcome.SUCCESS: "❌ {name} 未签到 (通过 /check 触发了首次签到)",
+    SigninOutcome.DUPLICATE: "✅ {name} 已签到",
+    SigninOutcome.COOKIE_INVALID: "❌ {name} Cookie失效或不正确",
+    COOKIE_CACHED: "❌ {name} Cookie失效或不正确（{message}，/add 更新后恢复）",
+    SigninOutcome.HTTP_ERROR: "❌ {name} 状态检查失败: {message}",
+    HTTP_BLANK: "❌ {name} 状态检查失败，HTTP {status}，响应无法解析。",
+    SigninOutcome.TIMEOUT: "❌ {name} 状态检查超时。",
+    SigninOutcome.NETWORK_ERROR: "❌ {name} 状态检查网络异常: {message}",
+    SigninOutcome.CHALLENGE: "❌ {name} 状态检查被 Cloudflare 拦截。",
+    SigninOutcome.CIRCUIT_OPEN: "⏸️ {name} 未检查：nodeseek.com 暂时不可用（熔断中）。",
+    SigninOutcome.PARSE_ERROR: "❌ {name} 状态检查响应解析失败。",
+    SigninOutcome.UNKNOWN: "❌ {name} 状态未知: {message}",
+    SigninOutcome.ERROR: "❌ {name} 状态检查发生未知错误: {message}",
+}.items()}
+
+def _template_key(result: SigninResult):
+    outcome = result.outcome
+    if result.cached:
+        if result.ok:
+            return CACHED_OK if result.reward is None else CACHED_OK_REWARD
+        if outcome is SigninOutcome.COOKIE_INVALID:
+            return COOKIE_CACHED
+    if outcome is SigninOutcome.HTTP_ERROR and not result.message:
+        return HTTP_BLANK
+    return outcome
+
+def _render(templates, result: SigninResult):
+    return templates[_template_key(result)](
+        name=wrap_md_code(result.account),
+        reward=result.reward if result.reward is not None else "未知",
+        message=escape_markdown(result.message) if result.message else "",
+        status=result.http_status,
+    )
 
-        # 只推送一次，不再重复触发签到
-        await send_tg_notification_async(f"📋 *NodeSeek 签到完成*\n\n{last_signin_result}")
-    finally:
-        is_signing_in = False
+def render_signin_result(result: SigninResult):
+    """
+    把签到结果渲染为发送给用户的 Markdown 文本
+    """
+    text = _render(SIGNIN_TEMPLATES, result)
+    if result.attempts > 1:
+        # 标记为“重试成功”或“重试失败”
+        text = f"✅（重试成功）{text}" if result.ok else f"❌（重试失败）{text}"
+    return text
+
+def render_check_result(result: SigninResult):
+    """
+    把 /check 的结果渲染为 Markdown 文本
+    """
+    return _render(CHECK_TEMPLATES, result)
+
+def render_batch_summary(results):
+    """
+    批量签到汇总：逐行列出各账号结果，Cookie 失效的账号合并为一个列表放在最后
+    """
+    lines = [render_signin_result(result) for result in results if result.outcome is not SigninOutcome.COOKIE_INVALID]
+    dead = [result for result in results if result.outcome is SigninOutcome.COOKIE_INVALID]
+    if dead:
+        names = "、".join(wrap_md_code(result.account) + ("" if result.cached else "（新）") for result in dead)
+        lines.append(
+            f"\n🔑 *需要更新 Cookie 的账号* ({len(dead)} 个，已暂停签到):\n{names}\n"
+            "使用 `/add <账号名称> <新cookie>` 更新后自动恢复"
+        )
+    return "\n".join(lines)
+
+PROBE_FLAG = "--probe"  # /check 参数：对没有本地记录的账号请求 nodeseek.com
+
+def render_check_unknown(account_name):
+    """
+    /check 未加 --probe 且账号今天没有本地记录时的提示
+    """
+    return f"❔ {wrap_md_code(account_name)} 今天还没有签到记录（加 `{PROBE_FLAG}` 向 nodeseek.com 查询，会执行一次签到）"
+
+# === 多进程签到 worker ===
+
+def signin_worker_main(shard: int, requests_queue, results_queue):
+    """
+    签到 worker 进程入口：在独立的事件循环中处理本分片的签到请求，结果写回 results_queue
+    """
+    asyncio.run(_signin_worker_loop(shard, requests_queue, results_queue))
+
+async def _signin_worker_loop(shard, requests_queue, results_queue):
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(SIGNIN_CONCURRENCY)
+    running = set()
+
+    async def handle(req_id, account_name, cookie_dict):
+        async with semaphore:
+            result = await request_attendance(account_name, cookie_dict)
+        fields = {name: getattr(result, name) for name in SigninResult.__dataclass_fields__}
+        fields["outcome"] = result.outcome.value
+        results_queue.put((req_id, fields))
+
+    print(f"🧵 签到 worker {shard} 已启动 (pid {os.getpid()})")
+    while True:
+        item = await loop.run_in_executor(None, requests_queue.get)
+        if item is None:
+            break
+        task = asyncio.create_task(handle(*item))
+        running.add(task)
+        task.add_done_callback(running.discard)
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
+    await attendance_transport.aclose()
+
+class SigninWorkerPool:
+    """
+    可选的多进程签到（SIGNIN_WORKERS > 0）：签到请求按账号名哈希分片交给固定的 worker 进程，
+    cloudscraper 质询计算、TLS 与响应解析都在 worker 中完成，不再与 Bot 的命令处理争用同一个事件循环和 GIL；
+    同一账号总是落在同一个 worker，会话池可以继续复用。
+    限速、熔断、Cookie 缓存和结果记录仍在 Bot 进程中进行，worker 只负责发请求并分类结果。
+    """
+    def __init__(self, size: int, request_timeout: float = 90):
+        self.size = size
+        self.request_timeout = request_timeout  # 等待 worker 返回的上限，超时按请求超时处理
+        self._ctx = multiprocessing.get_context("spawn")
+        self._requests = [self._ctx.Queue() for _ in range(size)]
+        self._results = self._ctx.Queue()
+        self._processes = [None] * size
+        self._pending = {}  # 请求序号 -> Future
+        self._next_id = 0
+        self._loop = None
+        self._reader = None
+
+    def _spawn(self, shard):
+        process = self._ctx.Process(
+            target=signin_worker_main, args=(shard, self._requests[shard], self._results),
+            name=f"signin-worker-{shard}", daemon=True,
+        )
+        process.start()
+        self._processes[shard] = process
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        for shard in range(self.size):
+            self._spawn(shard)
+        self._reader = threading.Thread(target=self._read_results, name="signin-worker-results", daemon=True)
+        self._reader.start()
+        print(f"🧵 已启动 {self.size} 个签到 worker 进程")
+
+    def shard_of(self, account_name):
+        return zlib.crc32(account_name.encode("utf-8")) % self.size
+
+    def _read_results(self):
+        """
+        后台线程：把 worker 返回的结果交回事件循环
+        """
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+            self._loop.call_soon_threadsafe(self._resolve, *item)
+
+    def _resolve(self, req_id, fields):
+        future = self._pending.pop(req_id, None)
+        if future is None or future.done():
+            return
+        fields["outcome"] = SigninOutcome(fields["outcome"])
+        future.set_result(SigninResult(**fields))
+
+    async def request(self, account_name, cookie_dict):
+        """
+        交给账号所在分片的 worker 发送签到请求，返回 SigninResult
+        """
+        shard = self.shard_of(account_name)
+        process = self._processes[shard]
+        if process is None or not process.is_alive():
+            print(f"⚠️ 签到 worker {shard} 已退出，正在重启")
+            self._spawn(shard)
+        self._next_id += 1
+        req_id = self._next_id
+        future = self._loop.create_future()
+        self._pending[req_id] = future
+        self._requests[shard].put((req_id, account_name, dict(cookie_dict)))
+        try:
+            return await asyncio.wait_for(future, self.request_timeout)
+        except asyncio.TimeoutError:
+            self._pending.pop(req_id, None)
+            return SigninResult(account_name, SigninOutcome.TIMEOUT, latency=self.request_timeout,
+                                error_class="TimeoutError", message=f"签到 worker {shard} 未在 {self.request_timeout:.0f}s 内返回")
+
+    async def close(self):
+        for shard, process in enumerate(self._processes):
+            if process is not None and process.is_alive():
+                self._requests[shard].put(None)
+        for process in self._processes:
+            if process is not None:
+                await run_blocking(process.join, 10)
+                if process.is_alive():
+                    process.terminate()
+        self._results.put(None)  # 结束读取线程
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+def start_signin_workers():
+    """
+    按 SIGNIN_WORKERS 启动签到 worker 进程池，需在事件循环中调用
+    """
+    global sign_in_workers
+    if SIGNIN_WORKERS > 0 and sign_in_workers is None:
+        sign_in_workers = SigninWorkerPool(SIGNIN_WORKERS)
+        sign_in_workers.start()
+    return sign_in_workers
 
 # === Telegram Bot 命令函数 ===
 
@@ -361,9 +2477,12 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "➕ `/add <账号名称> <cookie>` 添加新账号\n"
         "📋 `/list` 查看所有账号\n"
         "📅 `/last` 查看最近签到记录\n"
-        "🔍 `/check <账号名称>` 查询账号状态\n"
+        "🔍 `/check <账号名称> [--probe]` 查询账号状态\n"
         "⚡ `/force` 立即签到（仅管理员）\n"
+        "📦 `/status [任务ID]` 查看签到任务进度\n"
+        "🛑 `/cancel [任务ID]` 取消签到任务（仅管理员）\n"
         "🔄 `/retry <账号名称>` 手动补签该账号\n"
+        "📈 `/stats <账号名称> [天数]` 签到成功率统计\n"
         "🗑 `/delete <账号名称>` 删除账号（仅管理员）\n"
         "🛎️ `/help` 帮助信息",
         parse_mode="Markdown"
@@ -384,27 +2503,22 @@ async def add(update: Update, context: ContextTypes.DEFAULT_TYPE):
         name = context.args[0]
         cookie = " ".join(context.args[1:]).strip()
 
-        found = False
-        for account in accounts:
-            if account["name"] == name:
-                account["cookie"] = cookie
-                save_accounts(accounts)
-                found = True
-                await update.message.reply_text(
-                    f"✅ *账号 {name} 已更新*\n正在为该账号签到，请稍候...",
-                    parse_mode="Markdown"
-                )
-                task = create_tracked_task(sign_in_and_report(update, context, name, cookie))
-                break
-
-        if not found:
-            accounts.append({"name": name, "cookie": cookie})
-            save_accounts(accounts)
+        _, created = accounts.upsert(name, cookie)
+        save_accounts(accounts)
+        cookie_health.clear(name)  # 重新提交 Cookie 后恢复签到
+        daily_outcomes.discard(name)
+        if created:
             await update.message.reply_text(
-                f"✅ *已添加账号:* `{name}`\n正在为该账号签到，请稍候...",
+                f"✅ *已添加账号:* {wrap_md_code(name)}\n正在为该账号签到，请稍候...",
                 parse_mode="Markdown"
             )
-            task = create_tracked_task(sign_in_and_report(update, context, name, cookie))
+        else:
+            scraper_pool.invalidate(name)  # 旧会话可能残留旧 cookie 对应的状态
+            await update.message.reply_text(
+                f"✅ *账号* {wrap_md_code(name)} *已更新*\n正在为该账号签到，请稍候...",
+                parse_mode="Markdown"
+            )
+        create_tracked_task(sign_in_and_report(update, context, name, cookie))
 
     except Exception as e:
         logger.error("详细错误信息", exc_info=True)  # 打印完整错误堆栈到控制台
@@ -416,37 +2530,69 @@ async def sign_in_and_report(update: Update, context: ContextTypes.DEFAULT_TYPE,
     在add命令后立即为单个账号签到并向用户报告结果。
     """
     print(f"正在为账号 {name} 执行初次签到...")
-    # 这里直接调用 sign_in_single_account_with_retry，它现在会直接尝试签到
-    result_message = await asyncio.to_thread(sign_in_single_account, name, cookie)
-    await update.message.reply_text(result_message, parse_mode="Markdown")
+    # 这里直接调用 sign_in_with_retry，暂时性错误会按重试策略自动重试
+    result = await sign_in_with_retry(name, cookie)
+    await update.message.reply_text(render_signin_result(result), parse_mode="Markdown")
     print(f"账号 {name} 初次签到完成，结果已报告。")
 
+def render_account_page(page: int):
+    """
+    渲染 /list 的第 page 页（从 0 开始），只生成这一页的内容，返回 (文本, 翻页按钮)
+    """
+    total = len(accounts)
+    pages = max(1, -(-total // LIST_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    start = page * LIST_PAGE_SIZE
+    lines = [f"📋 *已添加账号* ({total} 个):" if pages == 1 else f"📋 *已添加账号* ({total} 个，第 {page + 1}/{pages} 页):"]
+    for i, acc in enumerate(accounts[start:start + LIST_PAGE_SIZE], start + 1):
+        lines.append(f"{i}. {wrap_md_code(acc['name'])}")
+
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("⬅️ 上一页", callback_data=f"list:{page - 1}"))
+    if page < pages - 1:
+        buttons.append(InlineKeyboardButton("下一页 ➡️", callback_data=f"list:{page + 1}"))
+    return "\n".join(lines), InlineKeyboardMarkup([buttons]) if buttons else None
+
 async def list_accounts(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    /list：查看所有添加的账号
+    /list：查看所有添加的账号，账号较多时分页显示
     """
     if not accounts:
         await update.message.reply_text("⚠️ 当前没有添加任何账号。")
         return
 
-    lines = [f"📋 *已添加账号* ({len(accounts)} 个):"]
-    for i, acc in enumerate(accounts, 1):
-        lines.append(f"{i}. `{wrap_md_code(acc['name'])}`")
-    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+    text, markup = render_account_page(0)
+    await update.message.reply_text(text, parse_mode="Markdown", reply_markup=markup)
+
+async def list_accounts_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /list 翻页按钮：按需渲染目标页并编辑原消息
+    """
+    query = update.callback_query
+    await query.answer()
+    if not accounts:
+        await query.edit_message_text("⚠️ 当前没有添加任何账号。")
+        return
+    text, markup = render_account_page(int(query.data.split(":", 1)[1]))
+    try:
+        await query.edit_message_text(text, parse_mode="Markdown", reply_markup=markup)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
 
 async def last(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     /last：查看最近签到记录
     """
-    logs = load_signin_logs()
+    latest = signin_journal.latest()  # 内存中的最近记录，不再读取日志文件
 
-    if not logs and last_signin_time is None:
+    if latest is None and last_signin_time is None:
         await update.message.reply_text("⚠️ 还没有执行过签到。")
         return
 
     # 优先用日志里最新的，如果日志为空，则用全局变量的时间和结果
-    if logs:
-        latest = logs[-1]  # 最近一次记录
+    if latest:
         time_str = latest['time']
         status_str = '✅ 成功' if latest['status'] == 'success' else '❌ 失败'
         message_str = latest['message']
@@ -459,6 +2605,7 @@ async def last(update: Update, context: ContextTypes.DEFAULT_TYPE):
     reply = (
         f"📅 *最近签到时间:*\n{time_str}\n\n"
         f"📋 *状态:*\n{status_str}\n\n"
+        f"🔌 *上游状态:*\n{circuit_breaker.describe()}\n\n"
         f"📝 *结果:*\n{message_str}"
     )
 
@@ -467,80 +2614,181 @@ async def last(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def check_accounts(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     /check 或 /check <账号名称>：查询所有账号签到状态或指定账号签到状态。
-    此函数现在将调用 api/attendance，并从其响应中判断是否已签到。
+    默认只读取本地记录（今天的签到结果、失效 Cookie），不请求 nodeseek.com；
+    加上 --probe 时，对没有本地记录的账号调用 api/attendance 查询（该接口会顺带执行签到）。
     """
     user_id = update.effective_user.id # 获取当前用户的ID
+    probe = PROBE_FLAG in context.args
+    args = [arg for arg in context.args if arg != PROBE_FLAG]
 
     if not accounts:
         await update.message.reply_text("⚠️ 当前没有任何账号，请先添加。")
         return
 
     lines = ["🔍 *账号签到状态:*"]
-    scraper = create_scraper() 
 
     # 判断是查询单个账号还是所有账号
-    if context.args:
+    if args:
         # 查询单个账号：所有人可用，无需权限检查
-        account_name_to_check = context.args[0]
-        found_account = None
-        for acc in accounts:
-            if acc['name'] == account_name_to_check:
-                found_account = acc
-                break
-        
+        account_name_to_check = args[0]
+        found_account = accounts.get(account_name_to_check)
+
         if found_account:
             name = found_account['name']
             cookie_dict = parse_cookie(found_account['cookie'])
-            status_message = await asyncio.to_thread(check_signin_status, scraper, name, cookie_dict)
-            lines.append(status_message)
+            result = local_check_result(name, cookie_dict)
+            if result is None and probe:
+                await nodeseek_limiter.acquire()
+                result = await check_signin_status(name, cookie_dict)
+            lines.append(render_check_result(result) if result else render_check_unknown(name))
         else:
-            lines.append(f"❌ 找不到名为 `{wrap_md_code(account_name_to_check)}` 的账号。")
+            lines.append(f"❌ 找不到名为 {wrap_md_code(account_name_to_check)} 的账号。")
     else:
         # 查询所有账号：仅管理员可用
         if user_id != ADMIN_USER_ID:
             await update.message.reply_text("❌ 你无权限使用该指令查询所有账号状态。请使用 `/check <账号名称>` 查询指定账号。", parse_mode="Markdown")
             return
-        
-        for acc in accounts:
-            name = acc['name']
-            cookie_dict = parse_cookie(acc['cookie'])
-            status_message = await asyncio.to_thread(check_signin_status, scraper, name, cookie_dict)
-            lines.append(status_message)
+
+        await check_all_accounts(update, context, probe)
+        return
 
     await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
 
+async def check_all_accounts(update: Update, context: ContextTypes.DEFAULT_TYPE, probe: bool = False):
+    """
+    查询所有账号：有本地记录的直接给出结果；probe 时其余账号并发请求
+    （最多 CHECK_CONCURRENCY 个同时进行，每个账号 CHECK_TIMEOUT 秒截止），结果按完成顺序实时编辑到状态消息中。
+    """
+    batch = list(accounts)
+    semaphore = asyncio.Semaphore(CHECK_CONCURRENCY)
+    local_lines, remote = [], []
+    for acc in batch:
+        result = local_check_result(acc['name'], parse_cookie(acc['cookie']))
+        if result is not None:
+            local_lines.append(render_check_result(result))
+        elif probe:
+            remote.append(acc)
+        else:
+            local_lines.append(render_check_unknown(acc['name']))
+
+    async def check_one(acc):
+        name = acc['name']
+        cookie_dict = parse_cookie(acc['cookie'])
+        async with semaphore:
+            await nodeseek_limiter.acquire()
+            try:
+                return await asyncio.wait_for(check_signin_status(name, cookie_dict), CHECK_TIMEOUT)
+            except asyncio.TimeoutError:
+                return SigninResult(name, SigninOutcome.TIMEOUT, latency=CHECK_TIMEOUT, error_class="TimeoutError")
+
+    progress = ProgressMessage(context.bot, update.effective_chat.id, "🔍 *账号签到状态:*", len(batch))
+    await progress.start()
+    for line in local_lines:
+        await progress.add(line)
+    for future in asyncio.as_completed([check_one(acc) for acc in remote]):
+        await progress.add(render_check_result(await future))
+    await progress.finish()
+
+async def account_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /stats <账号名称> [天数]：查看账号最近的签到成功率（需要 SQLite 存储）
+    """
+    if len(context.args) < 1:
+        await update.message.reply_text("❌ 格式错误，请使用: `/stats <账号名称> [天数]`", parse_mode="Markdown")
+        return
+
+    name = context.args[0]
+    try:
+        days = max(1, min(int(context.args[1]), ACCOUNT_HISTORY_RETENTION_DAYS)) if len(context.args) > 1 else 7
+    except ValueError:
+        await update.message.reply_text("❌ 天数必须是整数。")
+        return
+
+    rows = storage.account_stats(name, days)
+    if rows is None:
+        await update.message.reply_text("⚠️ 当前存储不保存单账号历史，请设置 `STORAGE_BACKEND=sqlite`。", parse_mode="Markdown")
+        return
+    if not rows:
+        await update.message.reply_text(f"⚠️ 账号 {wrap_md_code(name)} 最近 {days} 天没有签到记录。", parse_mode="Markdown")
+        return
+
+    ok_total = sum(ok for _, ok, _ in rows)
+    total = sum(count for _, _, count in rows)
+    lines = [f"📈 *账号* {wrap_md_code(name)} *最近 {days} 天签到统计:*"]
+    lines += [f"{day}  {'✅' if ok else '❌'} {ok}/{count}" for day, ok, count in rows]
+    lines.append(f"\n成功率: {ok_total / total:.0%}（{ok_total}/{total} 次请求）")
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
 async def force_signin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    /force：立即签到所有账号，仅管理员可用
+    /force：在后台立即签到所有账号并马上返回任务 ID，仅管理员可用
     """
     user_id = update.effective_user.id
     if user_id != ADMIN_USER_ID:
         await update.message.reply_text("❌ 你无权限使用该指令。")
         return
-    
-    # ✅ 添加防止重复执行的判断
-    if is_signing_in:
-        await update.message.reply_text("⚠️ 当前正在执行签到任务，请稍后再试。")
+
+    job = batch_jobs.start(requested_by=update.effective_chat.id)
+    if job is None:
+        # ✅ 防止重复执行
+        current = batch_jobs.current
+        detail = f" #{current.id}（{current.done}/{current.total}）" if current else ""
+        await update.message.reply_text(f"⚠️ 当前正在执行签到任务{detail}，可用 /status 查看进度。")
         return
-    
-    await update.message.reply_text("⚡ 开始立即签到，请稍候...")
+
+    bot = context.bot
+
+    async def report(job):
+        if job.state == "done":
+            update_last_signin("✅ 所有账号已完成签到", True)
+            await bot.send_message(chat_id=job.requested_by, text=f"✅ 签到任务 #{job.id} 已完成，所有账号已完成签到")
+            # ✅ 推送给所有订阅者
+            await broadcast_to_subscribers(bot, "✅ 签到成功！可以去看看收益了～")
+        elif job.state == "cancelled":
+            await bot.send_message(chat_id=job.requested_by, text=f"🛑 签到任务 #{job.id} 已取消，完成 {job.done}/{job.total} 个账号")
+        else:
+            errmsg = f"⚠️ 签到失败: {job.error}"
+            update_last_signin(errmsg, False)
+            await bot.send_message(chat_id=job.requested_by, text=errmsg)
+
+    job.on_done(report)
+    await update.message.reply_text(
+        f"⚡ 已在后台开始签到，任务 #{job.id}。\n用 /status 查看进度，/cancel 取消。"
+    )
+
+def _job_from_args(context):
+    """
+    /status、/cancel 的可选参数：任务 ID（可带 #），省略时取最近一个任务
+    """
+    if not context.args:
+        return batch_jobs.latest()
     try:
-        await sign_in_all_accounts_async()
-        update_last_signin("✅ 所有账号已完成签到")
-        await update.message.reply_text("✅ 所有账号已完成签到")
+        return batch_jobs.get(int(context.args[0].lstrip("#")))
+    except ValueError:
+        return None
 
-        # ✅ 推送给所有订阅者
-        for uid in subscribers:
-            try:
-                await context.bot.send_message(chat_id=uid, text="✅ 签到成功！可以去看看收益了～")
-            except Exception as e:
-                print(f"❌ 无法向用户 {uid} 推送消息: {e}")
-                logger.error("详细错误信息", exc_info=True)  # 打印完整错误堆栈到控制台
-    except Exception as e:
-        logger.error("详细错误信息", exc_info=True)  # 打印完整错误堆栈到控制台
-        errmsg = f"⚠️ 签到失败: {e}"
-        update_last_signin(errmsg)
-        await update.message.reply_text(errmsg)
+async def job_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /status [任务ID]：查看批量签到任务的进度
+    """
+    job = _job_from_args(context)
+    if job is None:
+        await update.message.reply_text("ℹ️ 没有找到签到任务。" if context.args else "ℹ️ 暂无签到任务，管理员可用 /force 启动。")
+        return
+    await update.message.reply_text(job.describe(), parse_mode="Markdown")
+
+async def cancel_job(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /cancel [任务ID]：取消正在运行的批量签到任务，仅管理员可用
+    """
+    if update.effective_user.id != ADMIN_USER_ID:
+        await update.message.reply_text("❌ 你无权限使用该指令。")
+        return
+    job = _job_from_args(context)
+    if job is None or not job.cancel():
+        await update.message.reply_text("ℹ️ 没有正在运行的签到任务。")
+        return
+    await update.message.reply_text(f"🛑 正在取消签到任务 #{job.id}，已完成的账号会照常汇总。")
 
 async def retry_account(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -551,20 +2799,16 @@ async def retry_account(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     name = context.args[0]
-    account = None
-    for acc in accounts:
-        if acc["name"] == name:
-            account = acc
-            break
+    account = accounts.get(name)
 
     if not account:
-        await update.message.reply_text(f"❌ 找不到名为 `{name}` 的账号。", parse_mode="Markdown")
+        await update.message.reply_text(f"❌ 找不到名为 {wrap_md_code(name)} 的账号。", parse_mode="Markdown")
         return
 
-    await update.message.reply_text(f"🔄 开始为账号 `{name}` 补签，请稍候...", parse_mode="Markdown")
+    await update.message.reply_text(f"🔄 开始为账号 {wrap_md_code(name)} 补签，请稍候...", parse_mode="Markdown")
     # 直接调用带重试的签到函数
-    result = await asyncio.to_thread(sign_in_single_account, name, account["cookie"])
-    await update.message.reply_text(result, parse_mode="Markdown")
+    result = await sign_in_with_retry(name, account["cookie"])
+    await update.message.reply_text(render_signin_result(result), parse_mode="Markdown")
 
 async def delete_account(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -580,16 +2824,16 @@ async def delete_account(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     name = context.args[0]
-    global accounts
 
-    for i, acc in enumerate(accounts):
-        if acc["name"] == name:
-            del accounts[i]
-            save_accounts(accounts)
-            await update.message.reply_text(f"✅ 已删除账号: `{name}`", parse_mode="Markdown")
-            return
+    if accounts.delete(name):
+        save_accounts(accounts)
+        scraper_pool.invalidate(name)
+        cookie_health.clear(name)
+        daily_outcomes.discard(name)
+        await update.message.reply_text(f"✅ 已删除账号: {wrap_md_code(name)}", parse_mode="Markdown")
+        return
 
-    await update.message.reply_text(f"❌ 找不到名为 `{name}` 的账号。", parse_mode="Markdown")
+    await update.message.reply_text(f"❌ 找不到名为 {wrap_md_code(name)} 的账号。", parse_mode="Markdown")
 
 async def push(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -613,73 +2857,733 @@ async def handle_pending_push_message(update: Update, context: ContextTypes.DEFA
 
     pending_push.remove(chat_id)  # 清除等待状态
     message = update.message.text.strip()
-    success_count = 0
-    fail_count = 0
 
-    for sub_id in subscribers:
-        try:
-            await context.bot.send_message(chat_id=sub_id, text=message, parse_mode="Markdown")
-            success_count += 1
-            if success_count % 20 == 0:
-                await asyncio.sleep(1)  # 每 20 次暂停 1 秒
-        except Exception as e:
-            print(f"推送消息失败给用户 {sub_id}: {e}")
-            logger.error("详细错误信息", exc_info=True)  # 打印完整错误堆栈到控制台
-            fail_count += 1
+    report = await broadcast_to_subscribers(context.bot, message, parse_mode="Markdown")
+    await update.message.reply_text(f"✅ 推送完成，{report.summary()}")
+
+async def subscriber_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /subs：查看订阅者数量与活跃情况，仅管理员可用
+    """
+    if update.effective_user.id != ADMIN_USER_ID:
+        await update.message.reply_text("❌ 你无权限使用该指令。")
+        return
 
-    await update.message.reply_text(f"✅ 推送完成，成功: {success_count}，失败: {fail_count}")
+    total, active = subscribers.counts()
+    await update.message.reply_text(f"👥 订阅者共 {total} 个，活跃 {active} 个，已停用 {total - active} 个。")
 
 # === Telegram 推送设置 ===
 
+MARKDOWN_CLOSERS = {"*": "*", "_": "_", "`": "`", "[": ")"}  # Markdown 实体的起止符（链接以 "[" 开始、")" 结束）
+
+def _safe_cut(line, limit, markdown=True):
+    """
+    在 line 的前 limit 个字符内找切分位置：优先最后一个不在 Markdown 实体内的空白处，
+    其次任意实体之外的位置，都没有时才硬切
+    """
+    closer = None
+    best_space = best_any = 0
+    i = 0
+    while i < limit:
+        ch = line[i]
+        if closer is not None:
+            if ch == closer:
+                closer = None
+            i += 1
+        elif markdown and ch == "\\":
+            i += 2  # 转义字符与其后的字符不能分开
+        elif markdown and ch in MARKDOWN_CLOSERS:
+            closer = MARKDOWN_CLOSERS[ch]
+            i += 1
+        else:
+            i += 1
+            if ch.isspace():
+                best_space = i
+        if closer is None and i <= limit:
+            best_any = i
+    return best_space or best_any or limit
+
+def iter_message_chunks(lines, limit: int = MESSAGE_CHUNK_LIMIT, markdown: bool = True):
+    """
+    把逐行产生的文本按需拼成不超过 limit 的消息：尽量在行边界切分，
+    单行过长时在 Markdown 实体之外切开。lines 可以是生成器，不会一次性展开。
+    """
+    if isinstance(lines, str):
+        lines = lines.split("\n")
+    buf, size = [], 0
+    for line in lines:
+        while len(line) > limit:
+            if buf:
+                yield "\n".join(buf)
+                buf, size = [], 0
+            cut = _safe_cut(line, limit, markdown)
+            yield line[:cut]
+            line = line[cut:]
+        extra = len(line) + (1 if buf else 0)
+        if buf and size + extra > limit:
+            yield "\n".join(buf)
+            buf, size, extra = [], 0, len(line)
+        buf.append(line)
+        size += extra
+    if buf and any(buf):
+        yield "\n".join(buf)
+
+class ProgressMessage:
+    """
+    把逐条到达的结果实时编辑进一条状态消息：编辑频率不超过 min_interval 秒一次，
+    单条消息接近长度上限时定稿（标题改为“第 N 部分”，不再显示进度），后续结果另起一条新消息。
+    """
+    MAX_LEN = MESSAGE_CHUNK_LIMIT
+
+    def __init__(self, bot, chat_id, title, total, min_interval: float = 2.0):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.title = title
+        self.total = total
+        self.min_interval = min_interval
+        self.done = 0
+        self._lines = []  # 当前这条消息里的结果行
+        self._part = 1  # 当前是第几条消息
+        self._message = None
+        self._last_edit = 0.0
+
+    def _render(self, final=False):
+        state = "已完成" if final else "进行中"
+        return "\n".join([f"{self.title} ({state} {self.done}/{self.total})"] + self._lines)
+
+    def _render_sealed(self):
+        return "\n".join([f"{self.title} (第 {self._part} 部分，后续结果见下一条)"] + self._lines)
+
+    async def start(self):
+        self._message = await self.bot.send_message(chat_id=self.chat_id, text=self._render(), parse_mode="Markdown")
+        self._last_edit = time.monotonic()
+
+    async def add(self, line):
+        if self._lines and len(self._render()) + len(line) + 1 > self.MAX_LEN:
+            # 当前消息写满：定稿后为后续结果开一条新消息
+            await self._edit(self._render_sealed())
+            self._part += 1
+            self._lines = [line]
+            self.done += 1
+            await self.start()
+            return
+        self._lines.append(line)
+        self.done += 1
+        if time.monotonic() - self._last_edit >= self.min_interval:
+            await self._edit(self._render())
+
+    async def finish(self):
+        await self._edit(self._render(final=True))
+
+    async def _edit(self, text):
+        try:
+            await self.bot.edit_message_text(
+                chat_id=self.chat_id, message_id=self._message.message_id, text=text, parse_mode="Markdown"
+            )
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                logger.error(f"更新进度消息失败: {e}")
+        self._last_edit = time.monotonic()
+
+class DeliveryReport:
+    """
+    一次广播的投递结果
+    """
+    __slots__ = ("total", "sent", "failed", "retried", "errors", "delivered", "dead", "elapsed")
+
+    def __init__(self, total: int):
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0  # 因限流或网络问题重发的次数
+        self.errors = {}  # chat_id -> 最后一次错误
+        self.delivered = []  # 发送成功的 chat_id
+        self.dead = set()  # 已屏蔽 Bot / 不存在的 chat_id
+        self.elapsed = 0.0
+
+    def summary(self):
+        rate = self.sent / self.elapsed if self.elapsed > 0 else 0.0
+        text = (f"成功: {self.sent}，失败: {self.failed}，重试: {self.retried}，"
+                f"耗时 {self.elapsed:.1f}s（{rate:.1f} 条/秒）")
+        if self.dead:
+            text += f"，停用失效订阅者: {len(self.dead)}"
+        return text
+
+def is_dead_chat_error(error):
+    """
+    判断发送错误是否说明该聊天已永久不可达（屏蔽了 Bot、账号注销、聊天不存在）
+    """
+    if isinstance(error, Forbidden):
+        return True
+    if isinstance(error, BadRequest):
+        message = str(error).lower()
+        return "chat not found" in message or "user is deactivated" in message or "peer_id_invalid" in message
+    return False
+
+class BroadcastDispatcher:
+    """
+    Telegram 群发：全局令牌桶（默认 25 条/秒，低于官方约 30 条/秒的上限）
+    加单聊天限速（每个聊天 1 条/秒），在限额内并发发送；
+    遇到 RetryAfter 时全体暂停指定秒数后重发，网络类错误指数退避重试，
+    BadRequest/Forbidden 等永久错误不重试。
+    """
+    def __init__(self, global_rate: float, per_chat_rate: float, concurrency: int, max_attempts: int):
+        # 突发量保持很小，避免第一秒内超过平台上限
+        self.global_limiter = RateLimiter(global_rate, burst=max(1, int(global_rate // 5)))
+        self.per_chat_rate = per_chat_rate
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self._chat_limiters = {}  # 只保留仍处于限速间隔内的聊天，群发结束后清理
+        self._paused_until = 0.0  # RetryAfter 触发的全局暂停
+
+    def _chat_limiter(self, chat_id):
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            limiter = self._chat_limiters[chat_id] = RateLimiter(self.per_chat_rate)
+        return limiter
+
+    def _evict_idle_limiters(self):
+        """
+        清理已过限速间隔的单聊天限速器：它们与新建的限速器等价，保留只会让字典随聊天数无限增长
+        """
+        now = time.monotonic()
+        idle = [chat_id for chat_id, limiter in self._chat_limiters.items() if limiter._next_slot <= now]
+        for chat_id in idle:
+            del self._chat_limiters[chat_id]
+
+    async def send(self, bot, chat_id, text, parse_mode=None, report=None):
+        """
+        向单个聊天发送消息（带限速与重试），返回 None 表示成功，否则返回最后的异常
+        """
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self._chat_limiter(chat_id).acquire()
+            await self.global_limiter.acquire()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                return None
+            except RetryAfter as e:
+                last_error = e
+                self._paused_until = max(self._paused_until, time.monotonic() + float(e.retry_after))
+                logger.warning(f"Telegram 限流，暂停发送 {e.retry_after}s")
+            except (BadRequest, Forbidden, InvalidToken, ChatMigrated) as e:
+                return e  # 永久错误，重试无意义
+            except (TimedOut, NetworkError) as e:
+                last_error = e
+                await asyncio.sleep(min(2 ** (attempt - 1), 30) + random.uniform(0, 0.5))
+            except TelegramError as e:
+                return e  # 其他 Telegram 错误只算该聊天失败，不影响其余聊天
+            except Exception as e:
+                logger.error(f"向 {chat_id} 发送消息时发生未知错误", exc_info=True)
+                return e
+            if report is not None and attempt < self.max_attempts:
+                report.retried += 1
+        return last_error
+
+    async def broadcast(self, bot, chat_ids, text, parse_mode=None):
+        """
+        向多个聊天群发同一条消息，返回 DeliveryReport。
+        text 也可以是分段后的消息列表，每个聊天按顺序收到全部分段，任一段失败即算该聊天失败。
+        """
+        chunks = [text] if isinstance(text, str) else list(text)
+        if not chunks:
+            return DeliveryReport(0)  # 空消息（分段结果为空）无需发送
+        chat_ids = list(chat_ids)
+        report = DeliveryReport(len(chat_ids))
+        queue = asyncio.Queue()
+        for chat_id in chat_ids:
+            queue.put_nowait(chat_id)
+
+        async def worker():
+            while True:
+                try:
+                    chat_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                error = None
+                for chunk in chunks:
+                    error = await self.send(bot, chat_id, chunk, parse_mode, report)
+                    if error is not None:
+                        break
+                if error is None:
+                    report.sent += 1
+                    report.delivered.append(chat_id)
+                else:
+                    report.failed += 1
+                    report.errors[chat_id] = str(error)
+                    if is_dead_chat_error(error):
+                        report.dead.add(chat_id)
+                    print(f"❌ 向用户 {chat_id} 推送失败: {error}")
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(chat_ids)))))
+        report.elapsed = time.monotonic() - started
+        self._evict_idle_limiters()
+        BROADCAST_MESSAGES.inc(report.sent, result="sent")
+        BROADCAST_MESSAGES.inc(report.failed, result="failed")
+        BROADCAST_RETRIES.inc(report.retried)
+        if report.elapsed > 0:
+            BROADCAST_RATE.set(round(report.sent / report.elapsed, 2))
+        return report
+
+broadcaster = BroadcastDispatcher(TG_BROADCAST_RATE, TG_PER_CHAT_RATE, TG_BROADCAST_CONCURRENCY, TG_SEND_MAX_ATTEMPTS)
+
+async def broadcast_to_subscribers(bot, text, parse_mode=None):
+    """
+    向所有活跃订阅者群发（超长消息先分段），并根据结果更新订阅者投递状态
+    """
+    chunks = list(iter_message_chunks(text, markdown=parse_mode is not None))
+    report = await broadcaster.broadcast(bot, subscribers.active_ids(), chunks, parse_mode)
+    subscribers.record_delivery(report)
+    return report
+
 async def send_long_message(chat_id, text, context, parse_mode=None):
     """
-    发送超长消息分段  以 4096 字符为最大长度进行切分
+    发送超长消息：按行和 Markdown 实体边界分段，每段不超过 MESSAGE_CHUNK_LIMIT 个字符
+    """
+    for chunk in iter_message_chunks(text, markdown=parse_mode is not None):
+        await context.bot.send_message(chat_id=chat_id, text=chunk, parse_mode=parse_mode)
+
+def build_bot_request():
+    """
+    发送消息用的 HTTP 连接池：容量覆盖群发并发数，并为命令回复留出余量
+    """
+    return HTTPXRequest(connection_pool_size=TG_CONNECTION_POOL_SIZE, pool_timeout=10.0)
+
+async def get_notify_bot():
+    """
+    返回用于推送的长期 Bot 实例：Bot 运行时直接复用 app.bot，
+    独立调用（例如没有启动 Application 时）才懒加载一个共享实例。
     """
-    MAX_LEN = 4000
-    for i in range(0, len(text), MAX_LEN):
-        await context.bot.send_message(chat_id=chat_id, text=text[i:i+MAX_LEN], parse_mode="Markdown")
+    global notify_bot, owns_notify_bot
+    if notify_bot is None:
+        TELEGRAM_TOKEN = os.getenv("TG_BOT_TOKEN")
+        if not TELEGRAM_TOKEN:
+            return None
+        bot = Bot(token=TELEGRAM_TOKEN, base_url=TG_API_BASE_URL, request=build_bot_request())
+        await bot.initialize()
+        notify_bot, owns_notify_bot = bot, True
+    return notify_bot
 
 async def send_tg_notification_async(message):
-    TELEGRAM_TOKEN = os.getenv("TG_BOT_TOKEN")
-    if not TELEGRAM_TOKEN:
+    bot = await get_notify_bot()
+    if bot is None:
         print("⚠️ Telegram配置缺失，无法推送通知。")
         return
 
-    from telegram import Bot
-    from telegram.error import TelegramError
+    report = await broadcast_to_subscribers(bot, message, parse_mode="Markdown")
+    print(f"📨 签到结果推送完成，{report.summary()}")
+    return report
 
-    bot = Bot(token=TELEGRAM_TOKEN)
-    subscribers = load_subscribers()  # 🔔 确保已加载订阅者
-    success_count = 0  # ✅ 初始化计数器
+# === 定时循环任务 ===
 
-    for user_id in subscribers:
+def parse_window(text: str):
+    """
+    解析 "HH:MM-HH:MM" 格式的时间窗口，返回规范化的字符串和 (开始分钟, 结束分钟)
+    """
+    try:
+        start_str, end_str = (part.strip() for part in text.split("-"))
+        start = datetime.strptime(start_str, "%H:%M")
+        end = datetime.strptime(end_str, "%H:%M")
+    except ValueError:
+        raise ValueError(f"时间窗口格式错误: {text!r}，应为 HH:MM-HH:MM")
+    start_min, end_min = start.hour * 60 + start.minute, end.hour * 60 + end.minute
+    if end_min <= start_min:
+        raise ValueError(f"时间窗口结束时间必须晚于开始时间: {text!r}")
+    return f"{start_str}-{end_str}", (start_min, end_min)
+
+class SigninScheduler:
+    """
+    持久化的分散式定时签到：每个账号在所属时间窗口内有一个由名称哈希得到的固定偏移，
+    按各自的时间点单独签到，避免整批账号同时请求 nodeseek.com。
+    待触发的账号放在一个按时间排序的堆中，调度循环只睡到堆顶的时间点，同一时刻只有一个定时器；
+    各账号的签到作为独立任务运行（最多 SIGNIN_CONCURRENCY 个），不占用 is_signing_in，/force 等命令不受影响。
+    当天已完成签到的账号通过存储后端保存（JSON 为 SCHEDULE_FILE），写入延迟合并执行，
+    重启后当天已完成的账号不会重复签到，已错过时间点但未完成的账号立即补签。
+    账号可用 "window" 字段指定自己的窗口，否则按名称哈希分到 SIGNIN_WINDOWS 中的某一个。
+    某个窗口当天的账号全部完成后推送一次该窗口的汇总。
+    熔断中的账号不占用并发名额等待，而是放回堆中，冷却结束后再试；
+    同一窗口当天共享一个等待上限（CIRCUIT_MAX_WAIT），超过后剩余账号按熔断跳过。
+    """
+    RECHECK_INTERVAL = 600  # 重新扫描账号列表的间隔（秒），新增账号或窗口变化在扫描时生效
+
+    def __init__(self, storage, windows: str, save_delay: float = 1.0):
+        self.storage = storage
+        self.save_delay = save_delay
+        self.default_windows = [parse_window(w)[0] for w in windows.split(",") if w.strip()]
+        if not self.default_windows:
+            raise ValueError("SIGNIN_WINDOWS 至少需要一个时间窗口")
+        self._completed = {}  # 账号名 -> 完成签到的日期（YYYY-MM-DD），只保留今天
+        self._changed = set()
+        self._save_handle = None
+        try:
+            self._completed = storage.load_signin_completed()
+        except (OSError, json.JSONDecodeError, AttributeError):
+            logger.error("读取定时签到状态失败，将重新计划", exc_info=True)
+        self._prune(get_now().date())
+        self._heap = []  # (触发时间戳, 序号, 账号名, 窗口, 日期, 第几次尝试)
+        self._seq = 0
+        self._scheduled = set()  # 已在堆中或正在签到的账号
+        self._attempted = {}  # 账号名 -> 本进程内最近处理过的日期，失败的账号当天不再重新计划
+        self._runs = {}  # (窗口, 日期) -> {"expected": set, "results": dict, "trips": int, "circuit_deadline": float}
+        self._running = set()  # 正在执行的签到任务
+        self._wakeup = None
+        self._semaphore = None
+        self._task = None  # 调度主循环
+
+    def _prune(self, today):
+        """
+        删除今天之前的完成记录，下次保存时一并从存储中删除
+        """
+        today_str = today.isoformat()
+        stale = [name for name, day in self._completed.items() if day != today_str]
+        for name in stale:
+            del self._completed[name]
+        if stale:
+            self._changed.update(stale)
+            self.save()
+
+    def save(self):
         try:
-            await bot.send_message(chat_id=user_id, text=message, parse_mode="Markdown")
-            success_count += 1
-            if success_count % 20 == 0:
-                await asyncio.sleep(1)  # 每 20 次暂停 1 秒
-        except TelegramError as e:
-            print(f"❌ 向用户 {user_id} 推送失败: {e}")
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(self.save_delay, self.flush)
+
+    def flush(self):
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if self._changed:
+            changed, self._changed = self._changed, set()
+            self.storage.save_signin_completed(self._completed, changed)
+
+    def window_of(self, acc):
+        """
+        账号所属的时间窗口
+        """
+        if acc.get("window"):
+            try:
+                return parse_window(acc["window"])[0]
+            except ValueError as e:
+                print(f"⚠️ 账号 {acc['name']} {e}，使用默认窗口")
+        index = zlib.crc32(acc["name"].encode("utf-8")) % len(self.default_windows)
+        return self.default_windows[index]
+
+    def fire_time(self, name, window, day):
+        """
+        账号在某天的签到时间：窗口开始时间 + 由名称哈希得到的固定偏移
+        """
+        _, (start_min, end_min) = parse_window(window)
+        midnight = CHINA_TZ.localize(datetime(day.year, day.month, day.day))
+        fraction = zlib.crc32(f"offset:{name}".encode("utf-8")) / 2**32
+        return midnight + timedelta(minutes=start_min + (end_min - start_min) * fraction)
+
+    def mark_completed(self, name, day=None):
+        """
+        记录账号当天已签到（成功或已签到），/add 后的签到和 /retry 也会调用
+        """
+        day_str = (day or get_now().date()).isoformat()
+        if self._completed.get(name) != day_str:
+            self._completed[name] = day_str
+            self._changed.add(name)
+            self.save()
+
+    def _push(self, when: float, name, window, day, attempt):
+        self._seq += 1
+        heapq.heappush(self._heap, (when, self._seq, name, window, day, attempt))
+        self._scheduled.add(name)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _plan(self, now):
+        """
+        把今天还未完成、也未在计划中的账号放入堆；时间点已过的立即触发
+        """
+        today = now.date()
+        today_str = today.isoformat()
+        planned = 0
+        for acc in accounts:
+            name = acc["name"]
+            if name in self._scheduled or today_str in (self._completed.get(name), self._attempted.get(name)):
+                continue
+            window = self.window_of(acc)
+            fire_at = max(self.fire_time(name, window, today), now)
+            run = self._runs.setdefault((window, today), {"expected": set(), "results": {}, "trips": circuit_breaker.trips})
+            run["expected"].add(name)
+            self._push(fire_at.timestamp(), name, window, today, 1)
+            planned += 1
+        if planned:
+            print(f"⏰ 已计划 {planned} 个账号今天的签到，{len(self._heap)} 个待触发")
+
+    async def _fire(self, name, window, day, attempt):
+        try:
+            acc = accounts.get(name)
+            if acc is None:
+                self._finish(name, window, day, None)  # 账号已删除
+                return
+            async with self._semaphore:
+                cached = cookie_health.cached_result(name, parse_cookie(acc["cookie"]))
+                if cached is not None:
+                    result = cached
+                else:
+                    if circuit_breaker.rejects() and self._requeue_on_circuit(name, window, day, attempt):
+                        return
+                    result = await run_sign_in(name, acc["cookie"])
+                    result.attempts = attempt
+            if result.outcome is SigninOutcome.CIRCUIT_OPEN and self._requeue_on_circuit(name, window, day, attempt):
+                return
+            if retry_policy.should_retry(result):
+                delay = retry_policy.backoff(attempt)
+                print(f"⚠️ 账号 {name} 第 {attempt} 次签到失败（{result.outcome.value}），{delay:.1f}s 后重试...")
+                self._push(time.time() + delay, name, window, day, attempt + 1)
+                return
+            self._finish(name, window, day, result)
+        except Exception as e:
+            logger.error("详细错误信息", exc_info=True)  # 打印完整错误堆栈到控制台
+            self._finish(name, window, day, SigninResult(name, SigninOutcome.ERROR, error_class=type(e).__name__, message=str(e)))
+
+    def _requeue_on_circuit(self, name, window, day, attempt):
+        """
+        熔断中：在本轮的等待上限内把账号放回堆中，等冷却结束后再试，返回是否已放回。
+        上限从该窗口当天首次遇到熔断时开始计算，与 /force 的批量签到共用一个上限的做法一致
+        """
+        run = self._runs.get((window, day))
+        if run is None:
+            return False
+        now = time.time()
+        deadline = run.setdefault("circuit_deadline", now + CIRCUIT_MAX_WAIT)
+        if now >= deadline:
+            return False
+        delay = max(circuit_breaker.retry_after(), 1.0) + random.uniform(0, 1.0)  # 错开，避免冷却结束时一齐排队
+        self._push(min(now + delay, deadline), name, window, day, attempt)
+        return True
+
+    def _finish(self, name, window, day, result):
+        self._scheduled.discard(name)
+        self._attempted[name] = day.isoformat()
+        if result is not None and result.ok:
+            self.mark_completed(name, day)
+        run = self._runs.get((window, day))
+        if run is None:
+            return
+        if result is None:
+            run["expected"].discard(name)
+        else:
+            run["results"][name] = result
+        if len(run["results"]) >= len(run["expected"]):
+            del self._runs[(window, day)]
+            if run["results"]:
+                order = {acc["name"]: i for i, acc in enumerate(accounts)}
+                results = sorted(run["results"].values(), key=lambda r: order.get(r.account, len(order)))
+                label = None if len(self.default_windows) == 1 and window == self.default_windows[0] else f"窗口 {window}"
+                create_tracked_task(publish_signin_summary(results, label, circuit_breaker.trips - run["trips"]))
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+        self._task.add_done_callback(handle_task_exception)
+
+    async def stop(self, timeout: float):
+        """
+        退出前停止调度，不再触发新的签到；等待正在进行的签到最多 timeout 秒，超时后取消
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        running = list(self._running)
+        if not running:
+            return
+        print(f"⏳ 等待 {len(running)} 个定时签到完成（最多 {timeout:g} 秒）...")
+        _, pending = await asyncio.wait(running, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def run(self):
+        """
+        调度主循环：睡到堆顶账号的时间点（或被新加入的任务唤醒），再把到期的账号逐个启动
+        """
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(SIGNIN_CONCURRENCY)
+        planned_day, next_scan = None, 0.0
+        while True:
+            now = get_now()
+            if now.date() != planned_day:
+                planned_day = now.date()
+                self._prune(planned_day)
+                retry_policy.reset()  # 每天恢复重试预算
+                next_scan = 0.0
+            if time.monotonic() >= next_scan:
+                self._plan(now)
+                next_scan = time.monotonic() + self.RECHECK_INTERVAL
+
+            while self._heap and self._heap[0][0] <= time.time():
+                _, _, name, window, day, attempt = heapq.heappop(self._heap)
+                task = asyncio.create_task(self._fire(name, window, day, attempt))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+                task.add_done_callback(handle_task_exception)
+
+            tomorrow = CHINA_TZ.localize(datetime.combine(planned_day + timedelta(days=1), datetime.min.time()))
+            wake_at = min(tomorrow.timestamp(), time.time() + self.RECHECK_INTERVAL)
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0][0])
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, wake_at - time.time()))
+            except asyncio.TimeoutError:
+                pass
 
-# === 定时循环任务 ===
+signin_scheduler = None if IS_WORKER_PROCESS else SigninScheduler(storage, SIGNIN_WINDOWS)
 
-async def signin_loop(app):
-    while True:
-        now = get_now()
-        next_hour = random.randint(7, 8)
-        next_minute = random.randint(0, 59)
-        next_run = now.replace(hour=next_hour, minute=next_minute, second=0, microsecond=0)
-        if next_run <= now:
-            next_run += timedelta(days=1)
+# === Webhook 模式 ===
 
-        wait_sec = (next_run - now).total_seconds()
-        print(f"⏰ 距离下次签到还有 {int(wait_sec//3600)}小时 {int((wait_sec%3600)//60)}分")
-        await asyncio.sleep(wait_sec)
-        await sign_in_all_accounts_async()
+class WebhookServer:
+    """
+    BOT_MODE=webhook 时接收 Telegram 推送的极简 HTTP 服务：校验路径与 secret token 后
+    把更新放进 app.update_queue 并立即返回 200，处理交给 Application（受 CONCURRENT_UPDATES 控制）。
+    支持长连接，Telegram 会复用连接连续推送更新。
+    """
+    MAX_BODY = 1 << 20  # 单个更新远小于 1 MB
+    IDLE_TIMEOUT = 75  # 长连接空闲多久后关闭（秒）
+
+    def __init__(self, app, path: str, secret_token: str):
+        if not secret_token:
+            raise ValueError("webhook 服务必须设置 secret token")
+        self.app = app
+        self.path = path or "/"
+        self.secret_token = secret_token
+        self._server = None
+        self._connections = set()
+
+    async def start(self, host: str, port: int):
+        """
+        开始监听，返回实际端口（port=0 时由系统分配）
+        """
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """
+        停止接收新的更新；已放进 update_queue 的更新仍会被处理
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()  # 空闲的长连接不会自己结束
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), self.IDLE_TIMEOUT)
+                if not request_line:
+                    break
+                headers = {}
+                while (line := await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                parts = request_line.decode("latin-1").split()
+                method, path = (parts[0], parts[1].split("?")[0]) if len(parts) > 1 else ("", "")
+                length = int(headers.get("content-length") or 0)
+                if length > self.MAX_BODY:
+                    await self._reply(writer, "413 Payload Too Large", keep_alive=False)
+                    break
+                body = await asyncio.wait_for(reader.readexactly(length), 5) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._reply(writer, self._accept(method, path, headers, body), keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    def _accept(self, method, path, headers, body):
+        if path != self.path:
+            status = "404 Not Found"
+        elif method != "POST":
+            status = "405 Method Not Allowed"
+        elif not hmac.compare_digest(
+                headers.get("x-telegram-bot-api-secret-token", "").encode(), self.secret_token.encode()):
+            status = "403 Forbidden"
+        else:
+            try:
+                update = Update.de_json(json.loads(body), self.app.bot)
+            except (ValueError, TypeError, KeyError):
+                logger.error("详细错误信息", exc_info=True)  # 打印完整错误堆栈到控制台
+                status = "400 Bad Request"
+            else:
+                self.app.update_queue.put_nowait(update)
+                status = "200 OK"
+        WEBHOOK_UPDATES.inc(status=status.split()[0])
+        return status
+
+    @staticmethod
+    async def _reply(writer, status, keep_alive=True):
+        body = status.encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+async def run_webhook(app):
+    """
+    webhook 模式的完整生命周期，与 run_polling 的顺序一致：
+    initialize → post_init → 开始接收 → start → 等待退出信号 → 停止接收 → stop → post_stop → shutdown → post_shutdown
+    """
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    # 没有 secret token 时任何人都能伪造管理员的更新，未配置则随机生成一个，只在本次运行中有效
+    secret_token = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", secret_token):
+        raise RuntimeError("WEBHOOK_SECRET 只能包含字母、数字、_ 和 -，长度 1~256")
+    if not WEBHOOK_SECRET:
+        print("🔐 未设置 WEBHOOK_SECRET，已为本次运行随机生成")
+    server = WebhookServer(app, urlsplit(WEBHOOK_URL).path, secret_token)
+    await app.initialize()
+    try:
+        if app.post_init:
+            await app.post_init(app)
+        port = await server.start(WEBHOOK_LISTEN, WEBHOOK_PORT)
+        await app.start()
+        await app.bot.set_webhook(
+            WEBHOOK_URL, secret_token=secret_token, allowed_updates=Update.ALL_TYPES
+        )
+        print(f"✅ Telegram Bot 启动成功（webhook），监听 {WEBHOOK_LISTEN}:{port}，推送地址 {WEBHOOK_URL}")
+        await stop_event.wait()
+        print("🛑 收到退出信号，停止接收更新...")
+    finally:
+        await server.close()
+        if app.running:
+            await app.stop()  # 处理完已收到的更新
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
 
 # === 启动时任务 ===
 
 async def on_startup(app):
+    global notify_bot, metrics_server
+    notify_bot = app.bot  # 推送通知复用正在运行的 Bot
+    metrics_server = await start_metrics_server()
+    start_signin_workers()
     await app.bot.set_my_commands([
         BotCommand("start", "启动Bot"),
         BotCommand("add", "添加账号"),
@@ -687,35 +3591,79 @@ async def on_startup(app):
         BotCommand("last", "查看最近签到记录"),
         BotCommand("check", "查询签到状态"),
         BotCommand("force", "立即签到（管理员）"),
+        BotCommand("status", "查看签到任务进度"),
+        BotCommand("cancel", "取消签到任务（管理员）"),
         BotCommand("retry", "补签指定账号"),
+        BotCommand("stats", "查看账号签到统计"),
         BotCommand("delete", "删除账号（管理员）"),
         BotCommand("push", "广播消息（管理员）"),
+        BotCommand("subs", "订阅者统计（管理员）"),
         BotCommand("help", "帮助信息"),
     ])
-    return [asyncio.create_task(signin_loop(app))]
+    signin_scheduler.start()
+
+async def on_stop(app):
+    # Bot 仍可用，让正在进行的定时签到和 /add 之后的签到等后台任务把结果发出去
+    await signin_scheduler.stop(SHUTDOWN_DRAIN_TIMEOUT)
+    await drain_tasks(SHUTDOWN_DRAIN_TIMEOUT)
+
+async def on_shutdown(app):
+    global notify_bot, owns_notify_bot
+    if metrics_server is not None:
+        metrics_server.close()
+    if owns_notify_bot:
+        await notify_bot.shutdown()
+    notify_bot, owns_notify_bot = None, False
+    accounts.flush()  # 写入尚未落盘的账号修改
+    daily_outcomes.flush()
+    signin_scheduler.flush()
+    storage.close()
+    if sign_in_workers is not None:
+        await sign_in_workers.close()
+    await attendance_transport.aclose()
+    blocking_executor.shutdown(wait=False)
 
 # === 入口启动 ===
 
-if __name__ == "__main__":
-    # 🚨 不要使用 asyncio.run()，直接同步 run_polling
-    TELEGRAM_TOKEN = os.getenv('TG_BOT_TOKEN')
-    if not TELEGRAM_TOKEN:
-        raise RuntimeError("环境变量 TG_BOT_TOKEN 未设置")
-
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+def build_application(token: str):
+    app = (
+        ApplicationBuilder().token(token).base_url(TG_API_BASE_URL).request(build_bot_request())
+        .concurrent_updates(CONCURRENT_UPDATES).build()
+    )
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("add", add))
     app.add_handler(CommandHandler("list", list_accounts))
+    app.add_handler(CallbackQueryHandler(list_accounts_page, pattern=r"^list:\d+$"))
     app.add_handler(CommandHandler("delete", delete_account))
     app.add_handler(CommandHandler("last", last))
     app.add_handler(CommandHandler("check", check_accounts))
     app.add_handler(CommandHandler("force", force_signin))
+    app.add_handler(CommandHandler("status", job_status))
+    app.add_handler(CommandHandler("cancel", cancel_job))
     app.add_handler(CommandHandler("retry", retry_account))
+    app.add_handler(CommandHandler("stats", account_stats))
     app.add_handler(CommandHandler("help", help_command))
     app.add_handler(CommandHandler("push", push))
+    app.add_handler(CommandHandler("subs", subscriber_stats))
     app.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), handle_pending_push_message))
 
     app.post_init = on_startup
+    app.post_stop = on_stop
+    app.post_shutdown = on_shutdown
+    return app
 
-    print("✅ Telegram Bot 启动成功，监听中...")
-    app.run_polling()
+if __name__ == "__main__":
+    TELEGRAM_TOKEN = os.getenv('TG_BOT_TOKEN')
+    if not TELEGRAM_TOKEN:
+        raise RuntimeError("环境变量 TG_BOT_TOKEN 未设置")
+
+    app = build_application(TELEGRAM_TOKEN)
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise RuntimeError("BOT_MODE=webhook 时必须设置 WEBHOOK_URL")
+        # webhook 模式自行管理生命周期，事件循环由 asyncio.run 创建
+        asyncio.run(run_webhook(app))
+    else:
+        # 🚨 不要使用 asyncio.run()，直接同步 run_polling
+        print("✅ Telegram Bot 启动成功，监听中...")
+        app.run_polling()